@@ -0,0 +1,396 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Bundles.
+#----------------------------------------------------------------------------#
+
+# Bundles built from the files of the static folder, in order. Every other
+# static file is fingerprinted as is.
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css',
+        'css/font-awesome.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+    ],
+    'js/app.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+
+# Static files that are not assets of the pages.
+EXCLUDED = ('openapi.json',)
+EXCLUDED_EXTENSIONS = ('.map',)
+
+# Types worth compressing, the others (images, woff) already are.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.otf', '.eot', '.json')
+# Variants written next to each compressible file, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+
+def minify_css(css):
+    """
+    Strips comments (but /*! license comments) and the whitespace around
+    punctuation, leaving strings alone.
+
+    Args: css: Stylesheet.
+
+    Returns: The minified stylesheet.
+    """
+    css = CSS_COMMENT.sub('', css)
+    parts = []
+    position = 0
+    for string in CSS_STRING.finditer(css):
+        parts.append(_minify_css_code(css[position:string.start()]))
+        parts.append(string.group())
+        position = string.end()
+    parts.append(_minify_css_code(css[position:]))
+    return ''.join(parts).strip()
+
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+    # Not before colons, '.a :hover' is not '.a:hover'.
+    code = code.replace(': ', ':')
+    return code.replace(';}', '}')
+
+
+def minify_js(js):
+    """
+    Returns: The script minified with rjsmin, unchanged without it.
+    """
+    try:
+        import rjsmin
+    except ImportError:
+        return js
+    return rjsmin.jsmin(js, keep_bang_comments=True)
+
+
+def compress(data, encoding):
+    """
+    Returns: The data compressed at the highest level, None when the
+             encoder is not installed.
+    """
+    if encoding == 'gzip':
+        # A fixed mtime keeps rebuilds byte for byte identical.
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def fingerprint(path, data):
+    """
+    Returns: The path with the content's hash before the extension.
+    """
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha256(data).hexdigest()[:HASH_LENGTH],
+                            ext)
+
+
+def rewrite_css_urls(css, source, assets):
+    """
+    Points the url()s of a stylesheet to the fingerprinted assets.
+
+    Args: css: Stylesheet.
+          source: Path of the stylesheet in the static folder.
+          assets: Dictionary of static paths to fingerprinted paths.
+
+    Returns: The stylesheet, its urls relative to the bundle's directory.
+    """
+    directory = posixpath.dirname(source)
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in assets:
+            return match.group()
+        return 'url({}{})'.format(
+            posixpath.relpath(assets[target], directory), suffix)
+    return CSS_URL.sub(replace, css)
+
+
+def list_static_files(static_folder, build_folder):
+    """
+    Returns: Sorted paths, relative to the static folder, of the files to
+             fingerprint.
+    """
+    paths = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs
+                   if os.path.join(root, d) != build_folder]
+        for name in files:
+            path = os.path.relpath(
+                os.path.join(root, name), static_folder).replace(os.sep, '/')
+            if path in EXCLUDED or path.endswith(EXCLUDED_EXTENSIONS):
+                continue
+            paths.append(path)
+    return sorted(paths)
+
+
+def write_file(path, data):
+    """
+    Writes a file atomically, running workers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = '{}.tmp{}'.format(path, os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def build(static_folder, build_folder):
+    """
+    Builds the assets: bundles and minifies the BUNDLES, fingerprints
+    every file, writes the gzip and brotli variants of the compressible
+    ones and the manifest. Files of the previous build are kept, pages
+    rendered before a deploy may still reference them, older ones are
+    deleted.
+
+    Args: static_folder: The app's static folder.
+          build_folder: Folder the built assets are written to.
+
+    Returns: The manifest.
+    """
+    bundled = {source for sources in BUNDLES.values() for source in sources}
+    assets, contents = {}, {}
+    # Files first, the stylesheets' urls point to their fingerprints.
+    for path in list_static_files(static_folder, build_folder):
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            data = f.read()
+        if path in bundled:
+            continue
+        assets[path] = fingerprint(path, data)
+        contents[assets[path]] = data
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source),
+                      encoding='utf-8') as f:
+                text = f.read()
+            if name.endswith('.css'):
+                parts.append(minify_css(rewrite_css_urls(text, source, assets)))
+            else:
+                parts.append(minify_js(text).rstrip().rstrip(';') + ';')
+        data = '\n'.join(parts).encode('utf-8')
+        assets[name] = fingerprint(name, data)
+        contents[assets[name]] = data
+
+    encodings = {}
+    for path, data in contents.items():
+        write_file(os.path.join(build_folder, path), data)
+        if not path.endswith(COMPRESSIBLE):
+            continue
+        for encoding, suffix in ENCODINGS:
+            compressed = compress(data, encoding)
+            if compressed is not None and len(compressed) < len(data):
+                write_file(os.path.join(build_folder, path + suffix),
+                           compressed)
+                encodings.setdefault(path, []).append(encoding)
+
+    manifest = {'assets': assets, 'encodings': encodings}
+    previous = read_manifest(build_folder) or {'assets': {}}
+    keep = set(contents) | set(previous['assets'].values())
+    prune(build_folder, keep)
+    write_file(os.path.join(build_folder, MANIFEST),
+               json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def prune(build_folder, keep):
+    """
+    Deletes the built files, and their variants, not listed in keep.
+    """
+    for path in list_static_files(build_folder, None):
+        base = path
+        for _, suffix in ENCODINGS:
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        if path != MANIFEST and base not in keep:
+            os.remove(os.path.join(build_folder, path))
+
+
+def read_manifest(build_folder):
+    """
+    Returns: The manifest of the last build, None if there is none.
+    """
+    try:
+        with open(os.path.join(build_folder, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('assets', __name__)
+
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """
+    Serves a fingerprinted asset, precompressed when the client accepts it.
+    Its name changes with its content, so it is cached for a year.
+    """
+    pipeline = current_app.extensions['assets']
+    options = {
+        'max_age': current_app.config.get('ASSETS_MAX_AGE', 31536000),
+        # Flask 2.0 only sets the ETag when asked to.
+        'etag': True,
+        'download_name': posixpath.basename(filename),
+        'mimetype': mimetypes.guess_type(filename)[0],
+    }
+    accepted = pipeline.encodings.get(filename, ())
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and request.accept_encodings[encoding]:
+            # The variants' ETags differ, they are derived from the path.
+            response = send_from_directory(
+                pipeline.build_folder, filename + suffix, **options)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(
+            pipeline.build_folder, filename, **options)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+#----------------------------------------------------------------------------#
+# Pipeline.
+#----------------------------------------------------------------------------#
+
+
+class AssetPipeline:
+    """
+    Serves the built assets and maps their names to fingerprinted URLs in
+    templates with static_url('css/app.css').
+
+    The assets are built by flask assets. A missing build is made when
+    first needed, and in debug mode rebuilt when a static file changes.
+
+    Configured from the app config:
+        ASSETS_BUILD_FOLDER: Folder of the built assets.
+        ASSETS_MAX_AGE: Seconds browsers cache the assets.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.build_folder = None
+        self.manifest = None
+        self.checked_at = 0.0
+        self._lock = threading.RLock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.build_folder = app.config.get('ASSETS_BUILD_FOLDER') or \
+            os.path.join(app.static_folder, 'build')
+        app.add_template_global(self.static_url)
+        app.register_blueprint(bp)
+        app.extensions['assets'] = self
+
+    @property
+    def encodings(self):
+        return self.load()['encodings']
+
+    def build(self):
+        """
+        Builds the assets and loads the new manifest.
+
+        Returns: The manifest.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            self.manifest = build(self.app.static_folder, self.build_folder)
+            logger.info('Built %d assets in %.2fs', len(
+                self.manifest['assets']), time.perf_counter() - started)
+            return self.manifest
+
+    def load(self):
+        """
+        Returns: The manifest, read once per process, built if missing.
+        """
+        if self.app.debug and self._stale():
+            return self.build()
+        if self.manifest is None:
+            with self._lock:
+                if self.manifest is None:
+                    manifest = read_manifest(self.build_folder)
+                    self.manifest = manifest if manifest is not None \
+                        else self.build()
+        return self.manifest
+
+    def static_url(self, filename):
+        """
+        Template global returning the URL of an asset.
+
+        Args: filename: Bundle name or path in the static folder.
+
+        Returns: URL of its fingerprinted build, of the static file when
+                 it is not built.
+        """
+        path = self.load()['assets'].get(filename)
+        if path is None:
+            return url_for('static', filename=filename)
+        return url_for('assets.asset', filename=path)
+
+    def _stale(self):
+        # Checked at most once a second, pages use several assets.
+        now = time.monotonic()
+        if now - self.checked_at < 1.0:
+            return False
+        self.checked_at = now
+        try:
+            built = os.path.getmtime(os.path.join(self.build_folder, MANIFEST))
+        except OSError:
+            return True
+        static_folder = self.app.static_folder
+        return any(
+            os.path.getmtime(os.path.join(static_folder, path)) > built
+            for path in list_static_files(static_folder, self.build_folder))
+
+
+assets = AssetPipeline()
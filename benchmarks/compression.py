@@ -0,0 +1,123 @@
+"""
+Benchmark of the dynamic compression of the pages and API responses.
+
+For each path, requests it through the app with Accept-Encoding identity,
+gzip and br at the configured levels (COMPRESS_LEVELS), reporting the
+bytes sent and the median latency, and the bytes saved against the
+latency added. Then compresses the uncompressed body at each level of
+LEVELS, reporting the size and the time taken, to choose the levels.
+
+The database named by DB_NAME (see config.py) must hold a catalogue, e.g.
+one loaded by benchmarks/run.py.
+
+Usage:
+    DB_NAME=fyyur_bench python benchmarks/compression.py [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PATHS = ('/', '/venues', '/artists', '/shows', '/venues/{venue_id}',
+         '/shows?format=json', '/export/shows.csv')
+ENCODINGS = ('identity', 'gzip', 'br')
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 6, 11)}
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def request_cases(client, path, repeat):
+    """
+    Returns: Dictionary of encoding to (bytes sent, median seconds) of the
+             path's response.
+    """
+    results = {}
+    for encoding in ENCODINGS:
+        headers = {'Accept-Encoding': encoding,
+                   'Authorization': 'Bearer {}'.format(
+                       client.application.config['INTERNAL_TOKEN'])}
+
+        def get():
+            response = client.get(path, headers=headers)
+            data = response.get_data()
+            assert response.status_code == 200, (path, response.status_code)
+            return data, response
+        data, response = get()
+        assert response.content_encoding in (None, encoding), path
+        results[encoding] = (len(data), median_time(get, repeat))
+    return results
+
+
+def level_cases(data, repeat):
+    """
+    Returns: Dictionary of (encoding, level) to (compressed bytes, median
+             seconds to compress the whole body).
+    """
+    from compression import ENCODERS
+
+    results = {}
+    for encoding, levels in LEVELS.items():
+        if encoding not in ENCODERS:
+            continue
+        for level in levels:
+            def compress():
+                encoder = ENCODERS[encoding](level)
+                return encoder.compress(data) + encoder.finish()
+            results[encoding, level] = (
+                len(compress()), median_time(compress, repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('CHANGEFEED_ENABLED', 'false')
+    os.environ['CACHE_BACKEND'] = 'none'
+    os.environ.setdefault('INTERNAL_TOKEN', 'benchmark')
+    from server import create_app
+    from models import Show, db
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        venue_id = db.session.query(Show.venue_id).limit(1).scalar()
+    bodies = {}
+    print('{:24} {:>9} {:>10} {:>10} {:>10} {:>10}'.format(
+        'path', 'encoding', 'bytes', 'ms', 'saved', 'added ms'))
+    for path in PATHS:
+        path = path.format(venue_id=venue_id)
+        bodies[path] = client.get(path).get_data()
+        results = request_cases(client, path, args.repeat)
+        plain_bytes, plain_seconds = results['identity']
+        for encoding, (size, seconds) in results.items():
+            print('{:24} {:>9} {:10d} {:10.2f} {:9.0f}% {:10.2f}'.format(
+                path, encoding, size, seconds * 1000,
+                100 * (1 - size / plain_bytes),
+                (seconds - plain_seconds) * 1000))
+
+    print()
+    print('{:24} {:>9} {:>10} {:>10} {:>10}'.format(
+        'path', 'level', 'bytes', 'ratio', 'ms'))
+    for path, data in bodies.items():
+        for (encoding, level), (size, seconds) in level_cases(
+                data, args.repeat).items():
+            print('{:24} {:>9} {:10d} {:10.1f} {:10.2f}'.format(
+                path, '{} {}'.format(encoding, level), size,
+                len(data) / size, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
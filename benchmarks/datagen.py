@@ -0,0 +1,185 @@
+"""
+Deterministic synthetic catalogue for the benchmarks.
+
+Generates venues, artists and shows whose sizes grow with a scale factor,
+with a skewed (Zipf-like) spread of cities, genres and show bookings so a
+few areas, genres, venues and artists dominate like in real data. The same
+seed and scale always produce the same rows. Shows are spread from three
+years in the past to one year ahead of today.
+
+Rows are loaded through the importer, i.e. validated and COPYed.
+
+Usage: python benchmarks/datagen.py [--scale 1] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enums import Genre
+
+VENUES_PER_SCALE = 1000
+ARTISTS_PER_SCALE = 2000
+SHOWS_PER_SCALE = 20000
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'),
+    ('Houston', 'TX'), ('Phoenix', 'AZ'), ('Philadelphia', 'PA'),
+    ('San Antonio', 'TX'), ('San Diego', 'CA'), ('Dallas', 'TX'),
+    ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+    ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Fort Worth', 'TX'),
+    ('Indianapolis', 'IN'), ('Charlotte', 'NC'), ('Seattle', 'WA'),
+    ('Denver', 'CO'), ('Washington', 'DC'), ('Boston', 'MA'),
+    ('Nashville', 'TN'), ('Detroit', 'MI'), ('Portland', 'OR'),
+    ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Louisville', 'KY'),
+    ('Baltimore', 'MD'), ('Milwaukee', 'WI'), ('Albuquerque', 'NM'),
+    ('Tucson', 'AZ'), ('Fresno', 'CA'), ('Sacramento', 'CA'),
+    ('Kansas City', 'MO'), ('Atlanta', 'GA'), ('Miami', 'FL'),
+    ('Raleigh', 'NC'), ('Omaha', 'NE'), ('Minneapolis', 'MN'),
+    ('New Orleans', 'LA'),
+]
+ADJECTIVES = ['Blue', 'Electric', 'Golden', 'Midnight', 'Velvet', 'Wild',
+              'Silver', 'Crimson', 'Hidden', 'Lucky', 'Neon', 'Old']
+NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Garden', 'Cellar', 'Club',
+         'Stage', 'Barn', 'Theatre', 'Den', 'Loft']
+FIRST_NAMES = ['Ada', 'Ben', 'Cleo', 'Dex', 'Eve', 'Finn', 'Gus', 'Ivy',
+               'Jude', 'Kai', 'Lou', 'Mae', 'Nico', 'Otis', 'Rae', 'Sky']
+BANDS = ['Echoes', 'Foxes', 'Rivers', 'Lights', 'Kings', 'Sparrows',
+         'Ghosts', 'Saints', 'Wolves', 'Machines', 'Drifters', 'Tides']
+
+
+def zipf_weights(n, s=1.1):
+    """
+    Returns: Cumulative weights of n ranks following a Zipf law.
+    """
+    total, cumulative = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** s
+        cumulative.append(total)
+    return cumulative
+
+
+def pick(rng, population, cum_weights):
+    return rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def genres(rng, genre_weights):
+    names = [g.name for g in Genre]
+    return sorted({pick(rng, names, genre_weights)
+                   for _ in range(rng.randint(1, 3))})
+
+
+def generate(scale=1.0, seed=42, today=None):
+    """
+    Generates the catalogue.
+
+    Args: scale: Scale factor of the catalogue size.
+          seed: Seed of the random generator.
+          today: Date shows are spread around, today by default.
+
+    Returns: Dictionary with iterators of 'venues', 'artists' and 'shows'
+             records as the importer reads them.
+    """
+    rng = random.Random(seed)
+    today = datetime.combine(today or datetime.today().date(), time(20))
+    n_venues = max(int(VENUES_PER_SCALE * scale), 1)
+    n_artists = max(int(ARTISTS_PER_SCALE * scale), 1)
+    n_shows = int(SHOWS_PER_SCALE * scale)
+    city_weights = zipf_weights(len(CITIES))
+    genre_weights = zipf_weights(len(Genre), 0.8)
+
+    def venues():
+        for i in range(1, n_venues + 1):
+            city, state = pick(rng, CITIES, city_weights)
+            yield i, {
+                'name': '{} {} {}'.format(
+                    rng.choice(ADJECTIVES), rng.choice(NOUNS), i),
+                'city': city,
+                'state': state,
+                'address': '{} Main Street'.format(rng.randint(1, 9999)),
+                'phone': '{:03d}-{:03d}-{:04d}'.format(
+                    rng.randint(200, 999), rng.randint(0, 999),
+                    rng.randint(0, 9999)),
+                'genres': genres(rng, genre_weights),
+                'facebook_link': 'https://www.facebook.com/venue{}'.format(i),
+                'seeking_talent': rng.random() < 0.3,
+            }
+
+    def artists():
+        for i in range(1, n_artists + 1):
+            city, state = pick(rng, CITIES, city_weights)
+            yield i, {
+                'name': '{} and the {} {}'.format(
+                    rng.choice(FIRST_NAMES), rng.choice(BANDS), i),
+                'city': city,
+                'state': state,
+                'phone': '{:03d}.{:03d}.{:04d}'.format(
+                    rng.randint(200, 999), rng.randint(0, 999),
+                    rng.randint(0, 9999)),
+                'genres': genres(rng, genre_weights),
+                'facebook_link': 'https://www.facebook.com/artist{}'.format(i),
+                'seeking_venue': rng.random() < 0.5,
+            }
+
+    def shows():
+        # Booking popularity follows the same skew as cities.
+        venue_weights = zipf_weights(n_venues, 0.7)
+        artist_weights = zipf_weights(n_artists, 0.7)
+        venue_ids = range(1, n_venues + 1)
+        artist_ids = range(1, n_artists + 1)
+        for i in range(1, n_shows + 1):
+            yield i, {
+                'venue_id': pick(rng, venue_ids, venue_weights),
+                'artist_id': pick(rng, artist_ids, artist_weights),
+                'start_time': today + timedelta(
+                    days=rng.randint(-3 * 365, 365),
+                    minutes=rng.choice((0, 30, 60, 90))),
+            }
+
+    return {'venues': venues(), 'artists': artists(), 'shows': shows()}
+
+
+def load(app, scale=1.0, seed=42):
+    """
+    Replaces the catalogue of the app's database with a generated one.
+
+    Returns: Dictionary of the number of rows loaded per table.
+    """
+    from models import db
+    from importer import import_rows
+    from services import refresh_upcoming_counts
+
+    loaded = {}
+    with app.app_context():
+        db.session.execute(
+            'TRUNCATE shows, venues, artists RESTART IDENTITY CASCADE')
+        db.session.commit()
+        data = generate(scale, seed)
+        # Venues and artists first, shows reference them.
+        for kind in ('venues', 'artists', 'shows'):
+            loaded[kind] = 0
+            for report in import_rows(kind, data[kind]):
+                if report['errors']:
+                    raise RuntimeError(report['errors'][:5])
+                loaded[kind] += report['loaded']
+        refresh_upcoming_counts()
+        db.session.execute('ANALYZE')
+        db.session.commit()
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from server import create_app
+    print(load(create_app(), args.scale, args.seed))
+
+
+if __name__ == '__main__':
+    main()
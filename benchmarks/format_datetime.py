@@ -0,0 +1,51 @@
+"""
+Micro-benchmark of the `datetime` Jinja filter.
+
+Compares the previous implementation, which re-parsed stringified
+start times with dateutil and went through babel.dates.format_datetime,
+with filters.format_datetime receiving native datetimes.
+
+Usage: python benchmarks/format_datetime.py [-n CALLS]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+from filters import format_datetime
+
+
+def format_datetime_before(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    value = datetime(2021, 8, 20, 21, 30)
+    assert format_datetime_before(str(value), 'full') == \
+        format_datetime(value, 'full')
+
+    before = timeit.timeit(
+        lambda: format_datetime_before(str(value), 'full'), number=args.calls)
+    after = timeit.timeit(
+        lambda: format_datetime(value, 'full'), number=args.calls)
+    print('before: {:8.2f} us/call'.format(before / args.calls * 1e6))
+    print('after:  {:8.2f} us/call'.format(after / args.calls * 1e6))
+    print('speedup: {:.1f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""
+Load test of the app over HTTP.
+
+Starts the app under gunicorn (or targets a running server with --url) and
+replays a weighted mix of requests from concurrent clients for a fixed
+duration. Throughput, latency percentiles (p50, p95, p99) and error rate
+are reported per route and overall, and optionally written as JSON.
+
+The mix defaults to MIX below. It can be taken from an access log in the
+common or combined format instead, every logged request being counted
+towards the route it matches. Requests use the ids of the catalogue of
+benchmarks/datagen.py at the given scale, load it first.
+
+Usage:
+    DB_NAME=fyyur_bench python benchmarks/load.py --workers 4 \\
+        --concurrency 32 --duration 60 -o load.json
+    python benchmarks/load.py --url http://127.0.0.1:5000 \\
+        --access-log /var/log/nginx/access.log
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.datagen import (
+    ADJECTIVES, BANDS, CITIES, VENUES_PER_SCALE, ARTISTS_PER_SCALE)
+
+#----------------------------------------------------------------------------#
+# Scenarios.
+#----------------------------------------------------------------------------#
+
+# Route (endpoint name): weight. Reads dominate, then searches, then writes.
+MIX = {
+    'index': 5,
+    'venues': 15,
+    'show_venue': 20,
+    'artists': 10,
+    'show_artist': 20,
+    'shows': 10,
+    'search_venues': 8,
+    'search_artists': 7,
+    'create_show_submission': 5,
+}
+
+
+def make_request(endpoint, rng, n_venues, n_artists):
+    """
+    Builds a request of a route with random arguments.
+
+    Args: endpoint: Endpoint name of the route, see MIX.
+          rng: Random generator.
+          n_venues, n_artists: Number of venues and artists in the database.
+
+    Returns: Tuple of (method, path, form body or None).
+    """
+    venue_id = rng.randint(1, n_venues)
+    artist_id = rng.randint(1, n_artists)
+    if endpoint == 'index':
+        return 'GET', '/', None
+    if endpoint == 'venues':
+        return 'GET', '/venues', None
+    if endpoint == 'show_venue':
+        return 'GET', '/venues/{}'.format(venue_id), None
+    if endpoint == 'artists':
+        return 'GET', '/artists', None
+    if endpoint == 'show_artist':
+        return 'GET', '/artists/{}'.format(artist_id), None
+    if endpoint == 'shows':
+        return 'GET', '/shows', None
+    if endpoint == 'search_venues':
+        term = rng.choice(ADJECTIVES + [', '.join(c) for c in CITIES[:5]])
+        return 'POST', '/venues/search', {'search_term': term}
+    if endpoint == 'search_artists':
+        return 'POST', '/artists/search', {'search_term': rng.choice(BANDS)}
+    if endpoint == 'create_show_submission':
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 365))
+        return 'POST', '/shows/create', {
+            'artist_id': artist_id,
+            'venue_id': venue_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+    raise ValueError('Unknown route ' + endpoint)
+
+
+LOG_REQUEST = re.compile(r'"([A-Z]+) (\S+) HTTP/[\d.]+"')
+
+
+def mix_from_access_log(path):
+    """
+    Counts the requests of an access log per route.
+
+    Args: path: Access log in the common or combined log format.
+
+    Returns: Dictionary of endpoint name to number of requests, limited to
+             the routes make_request supports.
+    """
+    from werkzeug.exceptions import HTTPException
+    from server import create_app
+
+    urls = create_app().url_map.bind('localhost')
+    counts = Counter()
+    with open(path) as f:
+        for line in f:
+            match = LOG_REQUEST.search(line)
+            if match is None:
+                continue
+            method, target = match.groups()
+            try:
+                endpoint, _ = urls.match(urlsplit(target).path, method=method)
+            except HTTPException:
+                continue
+            # Endpoints are named after their view, without the blueprint.
+            endpoint = endpoint.rpartition('.')[2]
+            if endpoint in MIX:
+                counts[endpoint] += 1
+    if not counts:
+        raise SystemExit('No supported request found in ' + path)
+    return dict(counts)
+
+#----------------------------------------------------------------------------#
+# Load.
+#----------------------------------------------------------------------------#
+
+
+class Client(threading.Thread):
+    """
+    Sends requests of the mix back to back over a keep-alive connection
+    until the deadline, recording (endpoint, seconds, ok) samples.
+    """
+
+    def __init__(self, url, mix, seed, n_venues, n_artists, deadline):
+        super().__init__(daemon=True)
+        self.url = urlsplit(url)
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.rng = random.Random(seed)
+        self.n_venues = n_venues
+        self.n_artists = n_artists
+        self.deadline = deadline
+        self.samples = []
+
+    def connect(self):
+        return http.client.HTTPConnection(
+            self.url.hostname, self.url.port or 80, timeout=30)
+
+    def run(self):
+        conn = self.connect()
+        while time.monotonic() < self.deadline:
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            method, path, form = make_request(
+                endpoint, self.rng, self.n_venues, self.n_artists)
+            body = urlencode(form) if form is not None else None
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'} \
+                if body is not None else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = self.connect()
+            self.samples.append(
+                (endpoint, time.perf_counter() - started, ok))
+        conn.close()
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(int(q * len(sorted_values)),
+                             len(sorted_values) - 1)]
+
+
+def summarize(samples, duration):
+    """
+    Args: samples: (endpoint, seconds, ok) tuples.
+          duration: Seconds the samples were collected over.
+
+    Returns: Dictionary of route (and 'total') to its requests, rps,
+             error rate and latency percentiles in milliseconds.
+    """
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample[0]].append(sample)
+        groups['total'].append(sample)
+    report = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(s[1] for s in group)
+        errors = sum(1 for s in group if not s[2])
+        report[endpoint] = {
+            'requests': len(group),
+            'rps': len(group) / duration,
+            'error_rate': errors / len(group),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+    return report
+
+
+def run(url, mix, concurrency, duration, warmup, seed, n_venues, n_artists):
+    """
+    Runs the clients, discarding the samples of the warm-up period.
+
+    Returns: The summary of the measured period, see summarize.
+    """
+    if warmup:
+        clients = [Client(url, mix, seed + i, n_venues, n_artists,
+                          time.monotonic() + warmup)
+                   for i in range(concurrency)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    clients = [Client(url, mix, seed + concurrency + i, n_venues, n_artists,
+                      time.monotonic() + duration)
+               for i in range(concurrency)]
+    started = time.monotonic()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - started
+    return summarize([s for c in clients for s in c.samples], elapsed)
+
+#----------------------------------------------------------------------------#
+# Server.
+#----------------------------------------------------------------------------#
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, threads):
+    """
+    Starts the app under gunicorn on a free local port.
+
+    Returns: Tuple of (process, base URL).
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        ['gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', '127.0.0.1:{}'.format(port), '--log-level', 'warning',
+         'app:app'],
+        cwd=ROOT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited with {}'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return process, 'http://127.0.0.1:{}'.format(port)
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('gunicorn did not start listening')
+
+
+def print_report(report):
+    print('{:25} {:>9} {:>9} {:>8} {:>9} {:>9} {:>9}'.format(
+        'route', 'requests', 'rps', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for endpoint in sorted(report, key=lambda e: (e == 'total', e)):
+        r = report[endpoint]
+        print('{:25} {:9d} {:9.1f} {:7.2%} {:9.2f} {:9.2f} {:9.2f}'.format(
+            endpoint, r['requests'], r['rps'], r['error_rate'],
+            r['p50_ms'], r['p95_ms'], r['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--url', help='Server to load instead of gunicorn.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scale the catalogue was generated at.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--access-log', help='Take the mix from this log.')
+    parser.add_argument('-o', '--output', help='Write the report as JSON.')
+    args = parser.parse_args()
+
+    mix = mix_from_access_log(args.access_log) if args.access_log else MIX
+    process, url = (None, args.url) if args.url else \
+        start_server(args.workers, args.threads)
+    try:
+        report = run(url, mix, args.concurrency, args.duration, args.warmup,
+                     args.seed, max(int(VENUES_PER_SCALE * args.scale), 1),
+                     max(int(ARTISTS_PER_SCALE * args.scale), 1))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': vars(args), 'mix': mix, 'report': report},
+                      f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Benchmarks every function of services.py and every GET route of
+controllers.py against a local Postgres database. The operational
+endpoints (/internal, /health, /metrics) are skipped, and the whole-table
+export only runs with --export.
+
+Each case is run a number of times and its wall time (min, median, p95,
+mean) and number of SQL statements per call are recorded. Results are
+written as JSON, tagged with the current git commit, so two runs can be
+diffed with --compare. The detail cache is disabled unless --cache is set.
+
+The database named by DB_NAME (see config.py) must be migrated; it is
+filled with the generated catalogue of benchmarks/datagen.py unless
+--no-load is given. Use a dedicated database, its catalogue is replaced.
+
+Usage:
+    DB_NAME=fyyur_bench python benchmarks/run.py --scale 1 -o before.json
+    DB_NAME=fyyur_bench python benchmarks/run.py --no-load \\
+        -o after.json --compare before.json
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Functions that are not worth timing on their own.
+SKIPPED_SERVICES = {'encode_cursor', 'decode_cursor', 'cursor_matches',
+                    'upcoming_cutoff', 'project', 'collect_page',
+                    'facet_filters'}
+
+
+def service_cases(ids):
+    """
+    Returns: Dictionary of case name to a callable running the service.
+    """
+    import services as s
+
+    full_venue = getattr(s.get_full_venue, '__wrapped__', s.get_full_venue)
+    full_artist = getattr(s.get_full_artist, '__wrapped__',
+                          s.get_full_artist)
+    venues_page, shows_page = s.get_all_venues(), s.get_all_shows()
+    return {
+        'get_table_versions': lambda: s.get_table_versions(
+            ('venues', 'artists', 'shows')),
+        'keyset_rows': lambda: list(s.keyset_rows(
+            s.db.session.query(s.Show.id), (s.Show.start_time, s.Show.id),
+            None, s.PAGE_SIZE, {})),
+        'search': lambda: s.search(s.Venue, s.VenueSummary, 'blue', 1,
+                                   s.SEARCH_PAGE_SIZE),
+        'get_related_shows': lambda: s.get_related_shows(
+            s.Show.venue_id, s.Artist, s.ArtistShow, ids['venue'], 1,
+            s.PAST_SHOWS_PAGE_SIZE),
+        'get_details': lambda: s.get_details(
+            s.Venue, s.VenueDetails, s.get_shows_with_artist, ids['venue'],
+            1, s.PAST_SHOWS_PAGE_SIZE),
+        'stream_page': lambda: s.collect_page(s.stream_page(
+            s.db.session.query(s.Show.id), (s.Show.start_time, s.Show.id),
+            None, s.PAGE_SIZE, lambda *row: row)),
+        'get_all_venues': s.get_all_venues,
+        'stream_all_venues': lambda: s.collect_page(s.stream_all_venues()),
+        'get_all_venues[page 2]': lambda: s.get_all_venues(
+            venues_page['next']),
+        'get_all_venues[genre]': lambda: s.get_all_venues(
+            genres=('Jazz',)),
+        'get_facets': lambda: s.get_facets(
+            s.Venue, s.Venue.seeking_talent, (), None, None),
+        'count_facets': lambda: s.count_facets(
+            s.Venue, s.Venue.seeking_talent, (), None, None),
+        'get_venue_facets': s.get_venue_facets,
+        'get_venue_facets[genre]': lambda: s.get_venue_facets(
+            genres=('Jazz',)),
+        'get_search_venues': lambda: s.get_search_venues('blue'),
+        'get_search_venues[area]': lambda: s.get_search_venues(
+            'New York, NY'),
+        'get_shows_with_artist': lambda: s.get_shows_with_artist(
+            ids['venue']),
+        'get_full_venue': lambda: full_venue(ids['venue']),
+        'get_venue_artist_ids': lambda: s.get_venue_artist_ids(
+            ids['venue']),
+        'invalidate_venue': lambda: s.invalidate_venue(ids['venue']),
+        'get_all_artists': s.get_all_artists,
+        'stream_all_artists': lambda: s.collect_page(s.stream_all_artists()),
+        'get_artist_facets': s.get_artist_facets,
+        'get_search_artists': lambda: s.get_search_artists('wolves'),
+        'get_shows_with_venues': lambda: s.get_shows_with_venues(
+            ids['artist']),
+        'get_full_artist': lambda: full_artist(ids['artist']),
+        'invalidate_artist': lambda: s.invalidate_artist(ids['artist']),
+        'get_all_shows': s.get_all_shows,
+        'stream_all_shows': lambda: s.collect_page(s.stream_all_shows()),
+        'get_all_shows[page 2]': lambda: s.get_all_shows(
+            shows_page['next']),
+        'refresh_upcoming_counts': s.refresh_upcoming_counts,
+    }
+
+
+# Operational endpoints, not pages of the site.
+SKIPPED_ROUTES = ('/internal/', '/health/', '/metrics')
+
+
+def route_cases(app, ids, export=False):
+    """
+    Args: app: The app.
+          ids: The busiest venue and artist, the routes' arguments.
+          export: Whether to benchmark the whole-table export too.
+
+    Returns: Dictionary of case name to a callable requesting every GET
+             route of the site.
+    """
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer {}'.format(
+        app.config['INTERNAL_TOKEN'])}
+    values = {'venue_id': ids['venue'], 'artist_id': ids['artist'],
+              'kind': 'shows', 'format': 'csv'}
+    cases = {}
+    for rule in app.url_map.iter_rules():
+        # Static files, e.g. those of the Swagger UI, are not benchmarked.
+        if 'GET' not in rule.methods or not rule.arguments <= set(values):
+            continue
+        if rule.rule.startswith(SKIPPED_ROUTES) or (
+                rule.rule.startswith('/export/') and not export):
+            continue
+        url = rule.build({a: values[a] for a in rule.arguments})[1]
+
+        def request(url=url):
+            response = client.get(url, headers=headers)
+            response.get_data()
+            assert response.status_code < 400, (url, response.status_code)
+        cases['GET ' + rule.rule] = request
+    return cases
+
+
+def measure(fn, repeat, count_statements):
+    timings, statements = [], []
+    for _ in range(repeat):
+        count_statements.clear()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        statements.append(len(count_statements))
+    timings.sort()
+    return {
+        'min_ms': timings[0] * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[int(0.95 * (len(timings) - 1))] * 1000,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'statements': max(statements),
+        'repeat': repeat,
+    }
+
+
+def compare(previous, current):
+    print('{:45} {:>12} {:>12} {:>8} {:>10}'.format(
+        'case', 'before ms', 'after ms', 'ratio', 'stmts'))
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if before is None:
+            print('{:45} {:>12} {:12.2f}'.format(
+                name, 'new', result['median_ms']))
+            continue
+        print('{:45} {:12.2f} {:12.2f} {:7.2f}x {:>4} -> {:<4}'.format(
+            name, before['median_ms'], result['median_ms'],
+            result['median_ms'] / before['median_ms']
+            if before['median_ms'] else float('inf'),
+            before['statements'], result['statements']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--no-load', action='store_true',
+                        help='Reuse the data already in the database.')
+    parser.add_argument('--cache', action='store_true',
+                        help='Keep the detail cache enabled.')
+    parser.add_argument('--export', action='store_true',
+                        help='Benchmark the whole-table export too.')
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Previous results to diff with.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('CHANGEFEED_ENABLED', 'false')
+    if not args.cache:
+        os.environ['CACHE_BACKEND'] = 'none'
+    os.environ.setdefault('METRICS_SLOW_REQUEST_SECONDS', '3600')
+    os.environ.setdefault('INTERNAL_TOKEN', 'benchmark')
+    from sqlalchemy import event, func
+    from server import create_app
+    from models import Show, db
+    import services
+    from benchmarks.datagen import load
+
+    app = create_app()
+    if not args.no_load:
+        print('Loaded', load(app, args.scale, args.seed))
+
+    statements = []
+    results = {}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *a: statements.append(a[2]))
+        # The busiest venue and artist are the worst case of detail pages.
+        ids = {
+            'venue': db.session.query(Show.venue_id).group_by(
+                Show.venue_id).order_by(func.count().desc()).limit(1).scalar(),
+            'artist': db.session.query(Show.artist_id).group_by(
+                Show.artist_id).order_by(func.count().desc()).limit(1).scalar(),
+        }
+        cases = service_cases(ids)
+        public = {name for name, f in inspect.getmembers(
+            services, inspect.isfunction)
+            if f.__module__ == 'services' and not name.startswith('_')}
+        missing = public - SKIPPED_SERVICES - {c.split('[')[0] for c in cases}
+        if missing:
+            print('Not benchmarked:', ', '.join(sorted(missing)))
+        for name, fn in cases.items():
+            results['services.' + name] = measure(fn, args.repeat, statements)
+            db.session.rollback()
+    for name, fn in route_cases(app, ids, args.export).items():
+        results[name] = measure(fn, args.repeat, statements)
+
+    commit = subprocess.run(
+        ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+        capture_output=True, text=True).stdout.strip()
+    output = {
+        'meta': {
+            'commit': commit,
+            # Unknown when the data was loaded by an earlier run.
+            'scale': None if args.no_load else args.scale,
+            'seed': None if args.no_load else args.seed,
+            'repeat': args.repeat,
+            'cache': args.cache,
+            'python': platform.python_version(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+    else:
+        for name, result in results.items():
+            print('{:45} {:10.2f} ms {:>4} statements'.format(
+                name, result['median_ms'], result['statements']))
+
+
+if __name__ == '__main__':
+    main()
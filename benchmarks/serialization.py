@@ -0,0 +1,182 @@
+"""
+Benchmark of the serialization of get_all_shows and get_full_venue.
+
+Compares, on the same queries, loading ORM instances and copying their
+vars() (the former Model.to_dict), zipping column rows into dictionaries,
+and the column-only __slots__ records of records.py the services return.
+For each, reports rows per second and the memory held per row while the
+result (and the session's identity map) is alive, and the peak.
+
+The database named by DB_NAME (see config.py) must hold a catalogue, e.g.
+one loaded by benchmarks/run.py.
+
+Usage:
+    DB_NAME=fyyur_bench python benchmarks/serialization.py [--rows 1000]
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def instance_dict(instance):
+    data = dict(vars(instance))
+    data.pop('_sa_instance_state', None)
+    return data
+
+
+def show_cases(rows):
+    """
+    Returns: Dictionary of strategy name to a callable returning the first
+             rows shows as get_all_shows lists them.
+    """
+    from sqlalchemy.orm import joinedload
+    from models import Venue, Artist, Show, db
+    import services
+
+    def orm():
+        shows = Show.query.options(
+            joinedload(Show.venue), joinedload(Show.artist)
+        ).order_by(Show.start_time, Show.id).limit(rows).all()
+        data = []
+        for show in shows:
+            item = instance_dict(show)
+            item['venue_name'] = show.venue.name
+            item['artist_name'] = show.artist.name
+            item['artist_image_link'] = show.artist.image_link
+            data.append(item)
+        return data
+
+    def dicts():
+        keys = ['venue_id', 'venue_name', 'artist_id', 'artist_name',
+                'artist_image_link', 'start_time', 'id']
+        query = db.session.query(
+            Show.venue_id, Venue.name, Show.artist_id, Artist.name,
+            Artist.image_link, Show.start_time, Show.id
+        ).select_from(Show).join(Venue).join(Artist).order_by(
+            Show.start_time, Show.id).limit(rows)
+        return [dict(zip(keys, row)) for row in query]
+
+    def records():
+        return services.get_all_shows(per_page=rows)['data']
+
+    return {'orm': orm, 'dicts': dicts, 'records': records}
+
+
+def venue_cases(id, rows):
+    """
+    Returns: Dictionary of strategy name to a callable returning the details
+             of the venue with up to rows past shows.
+    """
+    from models import Venue, Show, Artist
+    import services
+
+    class ShowDicts:
+        keys = ['artist_id', 'artist_name', 'artist_image_link', 'start_time']
+
+        @classmethod
+        def from_rows(cls, rows):
+            return [dict(zip(cls.keys, row)) for row in rows]
+
+    def orm():
+        # The former get_full_venue: the venue's vars() and show dictionaries.
+        venue = instance_dict(Venue.query.get(id))
+        past_shows, upcoming_shows, past_count, upcoming_count = \
+            services.get_related_shows(
+                Show.venue_id, Artist, ShowDicts, id, 1, rows)
+        venue['past_shows'] = past_shows
+        venue['upcoming_shows'] = upcoming_shows
+        venue['past_shows_count'] = past_count
+        venue['upcoming_shows_count'] = upcoming_count
+        return venue
+
+    get_full_venue = getattr(services.get_full_venue, '__wrapped__',
+                             services.get_full_venue)
+
+    def records():
+        return get_full_venue(id, past_page=1, per_page=rows)
+
+    return {'orm': orm, 'records': records}
+
+
+def count_rows(result):
+    """
+    Returns: Number of rows in a list of shows or in venue details, the venue
+             counting as one.
+    """
+    if isinstance(result, list):
+        return len(result)
+    get = result.get if isinstance(result, dict) else \
+        lambda name, default: getattr(result, name, default)
+    return 1 + len(get('past_shows', [])) + len(get('upcoming_shows', []))
+
+
+def measure(fn, repeat):
+    from models import db
+
+    # Memory held by the result and the session, and the peak while
+    # building it, once the statements are compiled and cached.
+    fn()
+    db.session.remove()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = count_rows(result)
+    del result
+    db.session.remove()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        db.session.remove()
+    return {
+        'rows': rows,
+        'rows_per_sec': rows / statistics.median(timings),
+        'held_bytes_per_row': (held - before) / rows,
+        'peak_bytes_per_row': (peak - before) / rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000,
+                        help='Shows listed, past shows of the venue.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('CHANGEFEED_ENABLED', 'false')
+    os.environ['CACHE_BACKEND'] = 'none'
+    from sqlalchemy import func
+    from server import create_app
+    from models import Show, db
+
+    app = create_app()
+    with app.app_context():
+        venue_id = db.session.query(Show.venue_id).group_by(
+            Show.venue_id).order_by(func.count().desc()).limit(1).scalar()
+        print('{:28} {:>8} {:>12} {:>12} {:>12}'.format(
+            'case', 'rows', 'rows/s', 'held B/row', 'peak B/row'))
+        for service, cases in (
+                ('get_all_shows', show_cases(args.rows)),
+                ('get_full_venue', venue_cases(venue_id, args.rows))):
+            for strategy, fn in cases.items():
+                result = measure(fn, args.repeat)
+                print('{:28} {:8d} {:12.0f} {:12.0f} {:12.0f}'.format(
+                    '{}[{}]'.format(service, strategy), result['rows'],
+                    result['rows_per_sec'], result['held_bytes_per_row'],
+                    result['peak_bytes_per_row']))
+
+
+if __name__ == '__main__':
+    main()
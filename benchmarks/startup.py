@@ -0,0 +1,100 @@
+"""
+Measures cold start: the time to import the app and create it, then the
+latency of the first requests a fresh process serves.
+
+Every sample runs in a new interpreter so module imports, the connection
+pool, template compilation and caches all start cold, as in a freshly
+scaled container. The slowest imports of one run are listed with
+--imports.
+
+Usage:
+    DB_NAME=fyyur_bench python benchmarks/startup.py --runs 10 -o startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paths requested in order by each fresh process.
+FIRST_REQUESTS = ('/', '/venues', '/artists', '/shows')
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import app
+timings = {'create_app': time.perf_counter() - started}
+client = app.test_client()
+for path in %r:
+    started = time.perf_counter()
+    response = client.get(path)
+    response.get_data()
+    timings['GET ' + path] = time.perf_counter() - started
+print(json.dumps(timings))
+""" % (FIRST_REQUESTS,)
+
+
+def sample():
+    """
+    Returns: Dictionary of step to seconds taken by a fresh process.
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, check=True,
+        capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def slowest_imports(count):
+    """
+    Returns: The count top-level modules and packages imported by the app
+             taking the longest, as (name, milliseconds including their
+             own imports) tuples.
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+        check=True, capture_output=True, text=True).stderr
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if '.' not in name:
+            imports[name] = max(imports.get(name, 0), int(cumulative) / 1000)
+    return sorted(imports.items(), key=lambda i: -i[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--imports', type=int, default=0,
+                        help='List this many of the slowest imports.')
+    parser.add_argument('-o', '--output', help='Write the results as JSON.')
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    results = {}
+    for step in samples[0]:
+        timings = sorted(s[step] for s in samples)
+        results[step] = {
+            'min_ms': timings[0] * 1000,
+            'median_ms': statistics.median(timings) * 1000,
+            'max_ms': timings[-1] * 1000,
+        }
+        print('{:20} {:10.1f} ms median {:10.1f} ms min'.format(
+            step, results[step]['median_ms'], results[step]['min_ms']))
+    imports = slowest_imports(args.imports) if args.imports else []
+    for name, ms in imports:
+        print('  import {:30} {:10.1f} ms'.format(name, ms))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results,
+                       'imports': imports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
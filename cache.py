@@ -0,0 +1,294 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from collections import OrderedDict, defaultdict
+from functools import wraps
+import pickle
+import threading
+import time
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class CacheBackend:
+    """
+    Interface of a cache backend.
+
+    Every entry is stored under a key and belongs to a tag, e.g. the venue
+    it was computed from, so writes can drop exactly the entries they affect.
+    A shared backend is seen by every worker, a local one by its process.
+    """
+    shared = False
+
+    def get(self, key):
+        """
+        Args: key: Key of the entry.
+
+        Returns: Tuple of (found, value).
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, tag):
+        """
+        Args: key: Key of the entry.
+              value: Value to store.
+              tag: Tag the entry belongs to.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tag):
+        """
+        Drops every entry belonging to the tag.
+
+        Args: tag: Tag to invalidate.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Drops every entry."""
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process, thread safe LRU cache bounded by size and entry age.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, tag, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, tag):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tag, time.monotonic() + self.ttl)
+            self._tags[tag].add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, tag, _ = self._entries.pop(key)
+        keys = self._tags[tag]
+        keys.discard(key)
+        if not keys:
+            del self._tags[tag]
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache stored in Redis, shared by every worker.
+
+    Works with any client exposing the redis-py API, so a local Redis
+    server or an in-memory stand-in such as fakeredis can be used.
+    """
+    shared = True
+
+    def __init__(self, client, ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+
+    def set(self, key, value, tag):
+        tag_key = self._tag(tag)
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), pickle.dumps(value), ex=self.ttl)
+        pipe.sadd(tag_key, self._key(key))
+        pipe.expire(tag_key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, tag):
+        tag_key = self._tag(tag)
+        keys = self.client.smembers(tag_key)
+        self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def _key(self, key):
+        return self.prefix + repr(key)
+
+    def _tag(self, tag):
+        return self.prefix + 'tag:' + repr(tag)
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+
+class Cache:
+    """
+    Read-through cache in front of the service functions.
+
+    Configured from the app config like the other extensions:
+        CACHE_BACKEND: 'lru', 'redis' or None to disable caching.
+        CACHE_MAX_SIZE: Maximum number of entries of the LRU backend.
+        CACHE_TTL: Seconds an entry stays valid.
+        CACHE_REDIS_URL: URL of the Redis server for the redis backend.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('CACHE_BACKEND', 'lru')
+        ttl = app.config.get('CACHE_TTL', 300)
+        if kind == 'lru':
+            self.backend = LRUCache(
+                max_size=app.config.get('CACHE_MAX_SIZE', 1024), ttl=ttl)
+        elif kind == 'redis':
+            self.backend = RedisCache.from_url(
+                app.config['CACHE_REDIS_URL'], ttl=ttl)
+        else:
+            self.backend = None
+        app.extensions['cache'] = self
+
+    def cached(self, tag_name):
+        """
+        Decorates a service function taking the entity ID as first argument
+        so its results are cached and tagged with (tag_name, id).
+
+        Args: tag_name: Name of the cached entity, e.g. 'venue'.
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapper(id, *args, **kwargs):
+                if self.backend is None:
+                    return f(id, *args, **kwargs)
+                key = (f.__name__, int(id), args, tuple(sorted(kwargs.items())))
+                found, value = self.backend.get(key)
+                if found:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+                value = f(id, *args, **kwargs)
+                self.backend.set(key, value, (tag_name, int(id)))
+                return value
+            return wrapper
+        return decorator
+
+    def get_or_set(self, key, tag, compute):
+        """
+        Read-through lookup of a result not tied to an entity, e.g. one
+        keyed by the versions of the tables it is computed from.
+
+        Args: key: Key of the result.
+              tag: Tag it is stored with.
+              compute: Function computing the result when it is missing.
+
+        Returns: The cached or computed result.
+        """
+        if self.backend is None:
+            return compute()
+        found, value = self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.backend.set(key, value, tag)
+        return value
+
+    def invalidate(self, tag_name, id):
+        """
+        Drops every cached result computed from the given entity.
+
+        Args: tag_name: Name of the entity, e.g. 'venue'.
+              id: ID of the entity.
+        """
+        if self.backend is not None:
+            self.backend.invalidate((tag_name, int(id)))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def clear_local(self):
+        """
+        Drops every entry held by this process only. A shared backend is
+        kept: the other workers evict its entries, and clearing it would
+        empty the cache of the whole fleet.
+        """
+        if self.backend is not None and not self.backend.shared:
+            self.backend.clear()
+
+    def stats(self):
+        """
+        Returns: Dictionary of the hit, miss and eviction counters.
+        """
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': getattr(self.backend, 'evictions', None),
+            'size': len(self.backend)
+            if isinstance(self.backend, LRUCache) else None
+        }
+
+    def samples(self):
+        """
+        Returns: The counters as (name, type, help, value) metric samples.
+        """
+        stats = self.stats()
+        return [
+            ('fyyur_cache_hits_total', 'counter', 'Cache hits.',
+             stats['hits']),
+            ('fyyur_cache_misses_total', 'counter', 'Cache misses.',
+             stats['misses']),
+            ('fyyur_cache_evictions_total', 'counter', 'Cache evictions.',
+             stats['evictions']),
+            ('fyyur_cache_entries', 'gauge', 'Cache entries.', stats['size']),
+        ]
+
+
+cache = Cache()
@@ -0,0 +1,254 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+import select
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from models import Venue, Artist, Show, db
+from cache import cache
+from services import invalidate_venue, invalidate_artist
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Producer.
+#----------------------------------------------------------------------------#
+
+TRACKED = (Venue, Artist, Show)
+
+# NOTIFY payloads are limited to 8000 bytes, related ids are sent in chunks.
+MAX_IDS_PER_EVENT = 500
+
+
+def make_event(table, id, op, **extra):
+    """
+    Args: table: Name of the changed table.
+          id: ID of the changed row.
+          op: 'insert', 'update' or 'delete'.
+          extra: Additional ids needed by consumers, e.g. a show's venue_id.
+
+    Returns: Compact dictionary describing the change.
+    """
+    change = {'t': table, 'id': id, 'op': op}
+    change.update(extra)
+    return change
+
+
+def record_change(session, table, id, op, **extra):
+    """
+    Queues a change to be published when the session commits. Needed for
+    writes that bypass the unit of work, like bulk deletes.
+
+    Args: session: Session the change was made in.
+          table, id, op, extra: See make_event.
+    """
+    session.info.setdefault('changes', []).append(
+        make_event(table, id, op, **extra))
+
+
+def collect_changes(session, flush_context):
+    """
+    after_flush hook queuing the flushed changes of the tracked models.
+    """
+    for instances, op in ((session.new, 'insert'),
+                          (session.dirty, 'update'),
+                          (session.deleted, 'delete')):
+        for obj in instances:
+            if not isinstance(obj, TRACKED):
+                continue
+            if op == 'update' and not session.is_modified(obj):
+                continue
+            extra = {}
+            if isinstance(obj, Show):
+                extra = {'venue_id': obj.venue_id, 'artist_id': obj.artist_id}
+            record_change(session, obj.__tablename__, obj.id, op, **extra)
+
+
+def discard_changes(session):
+    """
+    after_rollback hook dropping the changes of the rolled back transaction.
+    """
+    session.info.pop('changes', None)
+
+#----------------------------------------------------------------------------#
+# Change Feed.
+#----------------------------------------------------------------------------#
+
+
+class ChangeFeed:
+    """
+    Publishes committed changes to Venue, Artist and Show with NOTIFY and
+    consumes them in a background thread of every worker to evict the
+    local caches.
+
+    Configured from the app config:
+        CHANGEFEED_ENABLED: Publish and listen to changes.
+        CHANGEFEED_CHANNEL: Postgres channel the changes are sent on.
+        CHANGEFEED_DATABASE_URI: Direct connection used to LISTEN.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.channel = 'fyyur_changes'
+        self._thread = None
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('CHANGEFEED_ENABLED', False):
+            return
+        self.app = app
+        self.channel = app.config.get('CHANGEFEED_CHANNEL', self.channel)
+        event.listen(db.session, 'after_flush', collect_changes)
+        event.listen(db.session, 'after_commit', self.publish)
+        event.listen(db.session, 'after_rollback', discard_changes)
+        # Threads do not survive forking, start listening in the worker.
+        app.before_first_request(self.start)
+        app.extensions['changefeed'] = self
+
+    def publish(self, session):
+        """
+        after_commit hook sending the queued changes.
+
+        Uses its own connection since the committed session cannot emit
+        more statements at this point.
+        """
+        changes = session.info.pop('changes', None)
+        if not changes:
+            return
+        payloads = []
+        for change in changes:
+            artists = change.pop('artists', None)
+            payloads.append(json.dumps(change, separators=(',', ':')))
+            for i in range(0, len(artists or ()), MAX_IDS_PER_EVENT):
+                related = dict(change, artists=artists[i:i + MAX_IDS_PER_EVENT])
+                payloads.append(json.dumps(related, separators=(',', ':')))
+        try:
+            with db.get_engine(self.app).begin() as conn:
+                for payload in payloads:
+                    conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                                 {'channel': self.channel, 'payload': payload})
+        except Exception:
+            logger.exception('Could not publish %d changes', len(payloads))
+
+    def publish_reset(self):
+        """
+        Tells every worker to drop its whole cache, for writes that bypass
+        the ORM entirely such as COPY.
+        """
+        if self.app is None:
+            return
+        payload = json.dumps(make_event('*', None, 'reset'))
+        with db.get_engine(self.app).begin() as conn:
+            conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                         {'channel': self.channel, 'payload': payload})
+
+    def start(self):
+        """
+        Starts the listener thread of the current process, once.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.listen, name='changefeed', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout):
+        """
+        Waits for the listener to be listening, so what is cached from now
+        on gets evicted by the changes.
+
+        Args: timeout: Seconds to wait at most.
+
+        Returns: Whether it is listening.
+        """
+        return self._listening.wait(timeout)
+
+    def listen(self):
+        """
+        Listener loop, reconnecting on any error. The process's cache is
+        cleared on every reconnection since changes may have been missed
+        meanwhile, but not on the first connection, which missed nothing
+        and would drop the pages cached by warm_up. A change that fails to
+        be dispatched clears it too, without stopping the loop.
+        """
+        import psycopg2
+        # LISTEN needs a session of its own, bypassing any pooler.
+        url = make_url(self.app.config.get('CHANGEFEED_DATABASE_URI') or
+                       db.get_engine(self.app).url)
+        dsn = url.translate_connect_args(username='user', database='dbname')
+        connected = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute('LISTEN ' + self.channel)
+                if connected:
+                    cache.clear_local()
+                connected = True
+                self._listening.set()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        payload = conn.notifies.pop(0).payload
+                        try:
+                            self.dispatch(payload)
+                        except Exception:
+                            logger.exception('Could not dispatch change %r, '
+                                             'clearing the cache', payload)
+                            cache.clear_local()
+            except Exception:
+                # The thread must not die, the cache would never be evicted.
+                self._listening.clear()
+                logger.exception('Change feed connection lost, reconnecting')
+                time.sleep(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def dispatch(self, payload):
+        """
+        Evicts the local cache entries affected by a change.
+
+        Args: payload: JSON payload of the notification.
+        """
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning('Ignoring malformed change %r', payload)
+            return
+        table, id = change.get('t'), change.get('id')
+        if change.get('op') == 'reset':
+            cache.clear()
+        elif table == 'shows':
+            cache.invalidate('venue', change['venue_id'])
+            cache.invalidate('artist', change['artist_id'])
+        elif 'artists' in change:
+            for artist_id in change['artists']:
+                cache.invalidate('artist', artist_id)
+        elif table == 'venues':
+            with self.app.app_context():
+                invalidate_venue(id)
+                db.session.remove()
+        elif table == 'artists':
+            with self.app.app_context():
+                invalidate_artist(id)
+                db.session.remove()
+
+
+changefeed = ChangeFeed()
@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import click
+from flask import Blueprint, current_app
+from services import refresh_upcoming_counts
+from importer import TABLES, import_rows, read_rows
+from changefeed import changefeed
+from exporter import MODELS, FORMATS, export
+from openapi import build_spec, dump_spec
+from assets import assets
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+# Commands are added to the flask CLI as is, e.g. flask import.
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('refresh-counts')
+def refresh_counts_command():
+    """
+    Rolls the upcoming shows counters of venues and artists forward.
+
+    Schedule it daily right after midnight, e.g. with cron:
+        5 0 * * * cd /srv/fyyur && flask refresh-counts
+    """
+    changed = refresh_upcoming_counts()
+    click.echo('Updated {} upcoming shows counters.'.format(changed))
+
+
+@bp.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(TABLES)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='File format, guessed from the extension by default.')
+@click.option('--batch-size', default=10000, show_default=True,
+              help='Number of records loaded per COPY and transaction.')
+@click.option('--keep-ids', is_flag=True,
+              help='Load the records with their id, e.g. from an export.')
+def import_command(kind, file, format, batch_size, keep_ids):
+    """
+    Bulk loads venues, artists or shows from a CSV or NDJSON file.
+
+    Records are validated with the same rules as the forms and loaded with
+    COPY, one transaction per batch. Invalid records and rejected batches
+    are reported with their line numbers; the other batches are kept.
+    Records get new ids unless --keep-ids is set.
+    """
+    if format is None:
+        format = 'ndjson' if file.name.endswith(('.ndjson', '.jsonl')) \
+            else 'csv'
+    started = time.perf_counter()
+    read = loaded = failed = 0
+    for report in import_rows(kind, read_rows(file, format), batch_size,
+                              keep_ids):
+        read += report['read']
+        loaded += report['loaded']
+        failed += len(report['errors'])
+        click.echo('Batch {batch}: {loaded}/{read} loaded'.format(**report))
+        for line_number, message in report['errors']:
+            click.echo('  line {}: {}'.format(line_number, message), err=True)
+    elapsed = time.perf_counter() - started
+    if loaded:
+        changefeed.publish_reset()
+    click.echo('Loaded {} of {} {} in {:.1f}s ({:.0f} rows/s), {} errors.'
+               .format(loaded, read, kind, elapsed,
+                       loaded / elapsed if elapsed else 0, failed))
+
+
+@bp.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(MODELS)))
+@click.option('--format', 'format', type=click.Choice(sorted(FORMATS)),
+              default='csv', show_default=True)
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'),
+              default='-', help='Output file, stdout by default.')
+def export_command(kind, format, output):
+    """
+    Streams a full dump of venues, artists or shows as CSV or NDJSON.
+
+    Dumps can be loaded back with import --keep-ids, venues and artists
+    before the shows referring to them by id, into a database where their
+    ids are free.
+    """
+    for chunk in export(kind, format):
+        output.write(chunk)
+
+
+@bp.cli.command('openapi')
+@click.option('-o', '--output', type=click.Path(dir_okay=False),
+              help='Output file, OPENAPI_SPEC_PATH by default.')
+@click.option('--check', is_flag=True,
+              help='Only fail if the file is not up to date.')
+def openapi_command(output, check):
+    """
+    Builds the OpenAPI document served at /openapi.json from the routes,
+    their docstrings and the models.
+
+    Run it as a build step whenever routes or models change.
+    """
+    output = output or current_app.config['OPENAPI_SPEC_PATH']
+    text = dump_spec(build_spec(current_app))
+    if check:
+        try:
+            with open(output, encoding='utf-8') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != text:
+            raise click.ClickException(
+                '{} is out of date, run flask openapi.'.format(output))
+        click.echo('{} is up to date.'.format(output))
+        return
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(text)
+    click.echo('Wrote {}.'.format(output))
+
+
+@bp.cli.command('assets')
+def assets_command():
+    """
+    Bundles, minifies, fingerprints and precompresses the static files
+    into ASSETS_BUILD_FOLDER, served at /assets/ with far-future caching.
+
+    Run it as a build step whenever static files change.
+    """
+    manifest = assets.build()
+    click.echo('Built {} assets, {} precompressed, in {}.'.format(
+        len(manifest['assets']), len(manifest['encodings']),
+        assets.build_folder))
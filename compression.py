@@ -0,0 +1,237 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import zlib
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Encoders.
+#----------------------------------------------------------------------------#
+
+
+class GzipEncoder:
+    """
+    Incremental gzip stream, level 1 (fastest) to 9 (smallest).
+    """
+
+    def __init__(self, level):
+        # wbits 16 + 15 writes the gzip header and trailer.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """
+        Returns: The pending output, so the client can decode everything
+                 received so far.
+        """
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """
+    Incremental brotli stream, quality 0 (fastest) to 11 (smallest).
+    """
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+# Input bytes of a streamed response compressed between two flushes. Each
+# flush ends a compressed block: flushing every template chunk costs CPU
+# and ratio, flushing rarely delays the rows the client has not received.
+STREAM_FLUSH_SIZE = 16384
+
+# Encoders in order of preference when the client accepts several equally.
+ENCODERS = {'br': BrotliEncoder, 'gzip': GzipEncoder}
+if brotli is None:
+    del ENCODERS['br']
+
+#----------------------------------------------------------------------------#
+# Compression.
+#----------------------------------------------------------------------------#
+
+
+class Compression:
+    """
+    Compresses responses with brotli or gzip, as negotiated with the
+    client's Accept-Encoding.
+
+    Streamed pages are compressed chunk by chunk, flushed every
+    STREAM_FLUSH_SIZE bytes so the client renders the first rows while
+    the rest is generated. Bodies
+    shorter than COMPRESS_MIN_SIZE are sent as is, as are files (the
+    static assets are precompressed), responses already encoded, marked
+    no-transform or partial, and types without levels. The ETag of a
+    compressed response is made weak: the representation changes, but
+    the validator still answers the uncompressed page's conditional
+    requests.
+
+    Configured from the app config:
+        COMPRESS_LEVELS: Dictionary of mimetype to a dictionary of the
+                         encodings used for it and their levels, the CPU
+                         spent per response. Empty to disable.
+        COMPRESS_MIN_SIZE: Bytes under which bodies are not compressed.
+    """
+
+    def __init__(self, app=None):
+        self.levels = {}
+        self.min_size = 1024
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.levels = {
+            mimetype: {e: levels[e] for e in ENCODERS if e in levels}
+            for mimetype, levels in app.config.get(
+                'COMPRESS_LEVELS', {}).items()}
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        if self.levels:
+            app.after_request(self._after_request)
+        app.extensions['compression'] = self
+
+    def negotiate(self, response):
+        """
+        Returns: Tuple of (encoding, level) to compress the response with,
+                 None to send it as is.
+        """
+        levels = self.levels.get(response.mimetype)
+        if not levels or response.direct_passthrough or \
+                response.content_encoding or \
+                response.status_code < 200 or \
+                response.status_code in (204, 206, 304) or \
+                'no-transform' in response.cache_control:
+            return None
+        # Caches must keep a copy per encoding, even an uncompressed one.
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(list(levels))
+        if encoding is None:
+            return None
+        return encoding, levels[encoding]
+
+    def _after_request(self, response):
+        negotiated = self.negotiate(response)
+        if negotiated is None:
+            return response
+        encoding, level = negotiated
+        if response.is_streamed:
+            response.response = self.compress_stream(
+                response.response, response.iter_encoded(),
+                ENCODERS[encoding](level))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, ENCODERS[encoding](level)))
+        response.content_encoding = encoding
+        tag, weak = response.get_etag()
+        if tag and not weak:
+            response.set_etag(tag, weak=True)
+        return response
+
+    def compress(self, data, encoder):
+        """
+        Returns: The whole body compressed.
+        """
+        self.responses += 1
+        started = time.perf_counter()
+        compressed = encoder.compress(data) + encoder.finish()
+        self._count(len(data), len(compressed), started)
+        return compressed
+
+    def compress_stream(self, body, chunks, encoder):
+        """
+        Compresses a streamed body as it is generated.
+
+        Args: body: The response's iterable, closed with the returned one,
+                    even if it is never iterated, e.g. for a HEAD request.
+              chunks: Its chunks, as bytes.
+              encoder: Encoder of the negotiated encoding.
+
+        Returns: Iterator of compressed chunks.
+        """
+        self.responses += 1
+        return ClosingIterator(self._compress_chunks(chunks, encoder),
+                               getattr(body, 'close', None))
+
+    def _compress_chunks(self, chunks, encoder):
+        # The first chunk, the layout's head, is flushed at once.
+        pending = STREAM_FLUSH_SIZE
+        for chunk in chunks:
+            if not chunk:
+                continue
+            started = time.perf_counter()
+            compressed = encoder.compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_SIZE:
+                compressed += encoder.flush()
+                pending = 0
+            self._count(len(chunk), len(compressed), started)
+            if compressed:
+                yield compressed
+        started = time.perf_counter()
+        compressed = encoder.finish()
+        self._count(0, len(compressed), started)
+        yield compressed
+
+    def _count(self, bytes_in, bytes_out, started):
+        self.seconds += time.perf_counter() - started
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def stats(self):
+        """
+        Returns: Dictionary of the compressed responses, their bytes before
+                 and after and the time spent compressing.
+        """
+        return {
+            'responses': self.responses,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'seconds': self.seconds,
+        }
+
+    def samples(self):
+        """
+        Returns: The counters as (name, type, help, value) metric samples.
+        """
+        stats = self.stats()
+        return [
+            ('fyyur_compressed_responses_total', 'counter',
+             'Responses compressed.', stats['responses']),
+            ('fyyur_compression_input_bytes_total', 'counter',
+             'Bytes of the responses before compression.', stats['bytes_in']),
+            ('fyyur_compression_output_bytes_total', 'counter',
+             'Bytes of the responses after compression.', stats['bytes_out']),
+            ('fyyur_compression_seconds_total', 'counter',
+             'Time spent compressing responses.', stats['seconds']),
+        ]
+
+
+compression = Compression()
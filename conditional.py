@@ -0,0 +1,63 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from hashlib import sha1
+from flask import current_app, g, make_response, request, session
+from werkzeug.http import is_resource_modified
+from services import get_table_versions
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+
+def conditional(policy, *tables, primary=False):
+    """
+    Decorates a GET view so it answers If-None-Match / If-Modified-Since
+    with a 304 before running the view, using the change counters of the
+    tables the page is rendered from as validators.
+
+    Pages also depend on the current date (past vs upcoming shows), so the
+    date is part of the ETag and Last-Modified is never before midnight.
+    Responses carrying flashed messages are never answered with a 304.
+    The counters are kept in g.table_versions for the templates' fragment
+    cache keys.
+
+    Args: policy: Key of the Cache-Control policy in HTTP_CACHE_CONTROL.
+          tables: Names of the tables the page is rendered from.
+          primary: Whether the page is read from the primary, whose
+                   counters must then validate it, see get_table_versions.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+            versions = g.table_versions = get_table_versions(
+                tables, primary)
+            today = date.today()
+            etag = sha1(repr((
+                request.full_path,
+                [versions.get(t, (0,))[0] for t in tables],
+                today.isoformat()
+            )).encode()).hexdigest()
+            last_modified = max(
+                [v[1] for v in versions.values()] +
+                [datetime.combine(today, time.min).astimezone(timezone.utc)]
+            )
+            if is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified):
+                response = make_response(f(*args, **kwargs))
+            else:
+                response = make_response('', 304)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = \
+                current_app.config['HTTP_CACHE_CONTROL'][policy]
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -1,10 +1,13 @@
 import os
+from sqlalchemy.pool import NullPool
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode, e.g. DEBUG=true python app.py. Never in production.
+DEBUG = os.getenv('DEBUG', 'false') == 'true'
+# Testing mode, set by the test suite. Errors are not logged to error.log.
+TESTING = os.getenv('TESTING', 'false') == 'true'
 
 # Connect to the database
 DB_HOST = os.getenv('DB_HOST', '127.0.0.1:5432')
@@ -17,3 +20,114 @@ SQLALCHEMY_DATABASE_URI = DB_PATH
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Connection pool.
+# Behind PgBouncer in transaction pooling mode (DB_PGBOUNCER=true) the app
+# keeps no pool of its own and holds no server-side state across
+# transactions; point DB_DIRECT_HOST at Postgres itself for LISTEN.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false') == 'true'
+DB_DIRECT_HOST = os.getenv('DB_DIRECT_HOST', DB_HOST)
+if DB_PGBOUNCER:
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
+else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true') == 'true',
+    }
+
+# Optional read replica for the listing, search and detail pages, e.g.
+# DB_REPLICA_HOST=127.0.0.1:5433 (or a second database on the same host
+# with DB_REPLICA_NAME, to try it locally). Reads fall back to the primary
+# when the replica lags more than REPLICA_MAX_LAG_SECONDS, and a client
+# reads from the primary for REPLICA_STICKY_SECONDS after writing. The
+# cached detail pages are always read from the primary, a stale page would
+# stay cached for CACHE_TTL.
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME', DB_NAME)
+SQLALCHEMY_REPLICA_URI = 'postgresql+psycopg2://{}:{}@{}/{}'.format(
+    DB_USER, DB_PASSWORD, DB_REPLICA_HOST, DB_REPLICA_NAME
+) if DB_REPLICA_HOST else None
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', 1))
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+# Number of results per page on the search pages.
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+
+# Number of rows per page on the venues, artists and shows listings.
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+
+# Number of past shows per page on the venue and artist detail pages.
+PAST_SHOWS_PAGE_SIZE = int(os.getenv('PAST_SHOWS_PAGE_SIZE', 12))
+
+# Read-through cache of the venue and artist detail pages.
+# CACHE_BACKEND is 'lru' (per process), 'redis' (shared) or 'none'.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'lru')
+CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', 1024))
+CACHE_TTL = int(os.getenv('CACHE_TTL', 300))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# Cross-worker cache invalidation through Postgres LISTEN/NOTIFY.
+CHANGEFEED_ENABLED = os.getenv('CHANGEFEED_ENABLED', 'true') == 'true'
+CHANGEFEED_CHANNEL = os.getenv('CHANGEFEED_CHANNEL', 'fyyur_changes')
+CHANGEFEED_DATABASE_URI = 'postgresql+psycopg2://{}:{}@{}/{}'.format(
+    DB_USER, DB_PASSWORD, DB_DIRECT_HOST, DB_NAME)
+
+# Cache-Control of the catalogue pages, which answer conditional requests.
+# 'no-cache' lets browsers and CDNs store pages but revalidate every time.
+HTTP_CACHE_CONTROL = {
+    'listing': os.getenv('HTTP_CACHE_CONTROL_LISTING', 'public, no-cache'),
+    'detail': os.getenv('HTTP_CACHE_CONTROL_DETAIL', 'public, no-cache'),
+}
+
+# Compiled templates are cached in this directory, shared by the workers
+# and kept across restarts. Empty to compile them in every process.
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    'JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+
+# Rendered fragments of the listings ({% cache %} tags) kept by each
+# worker, 0 to disable.
+FRAGMENT_CACHE_MAX_SIZE = int(os.getenv('FRAGMENT_CACHE_MAX_SIZE', 10000))
+
+# Detail pages of this many venues and artists (those with the most
+# upcoming shows) are cached by each worker before it accepts requests.
+WARMUP_CACHED_PAGES = int(os.getenv('WARMUP_CACHED_PAGES', 20))
+
+# OpenAPI document written by flask openapi and served at /openapi.json.
+OPENAPI_SPEC_PATH = os.getenv(
+    'OPENAPI_SPEC_PATH', os.path.join(basedir, 'static', 'openapi.json'))
+
+# Fingerprinted, precompressed assets are built by flask assets into this
+# folder and cached by browsers for ASSETS_MAX_AGE seconds.
+ASSETS_BUILD_FOLDER = os.getenv(
+    'ASSETS_BUILD_FOLDER', os.path.join(basedir, 'static', 'build'))
+ASSETS_MAX_AGE = int(os.getenv('ASSETS_MAX_AGE', 31536000))
+
+# Dynamic compression of the responses: the brotli (0-11) and gzip (1-9)
+# levels per type, higher levels trading CPU per response for bytes.
+# Types not listed are sent as is, an empty dictionary disables it.
+compress_levels = {'br': int(os.getenv('COMPRESS_BR_LEVEL', 4)),
+                   'gzip': int(os.getenv('COMPRESS_GZIP_LEVEL', 6))}
+COMPRESS_LEVELS = {
+    'text/html': compress_levels,
+    'application/json': compress_levels,
+    'application/x-ndjson': compress_levels,
+    'text/csv': compress_levels,
+    'text/plain': compress_levels,
+} if os.getenv('COMPRESS_ENABLED', 'true') == 'true' else {}
+# Bodies shorter than this many bytes are not worth compressing.
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+# Serve the Swagger UI at /apidocs/, on by default in debug mode only.
+SWAGGER_UI = os.getenv('SWAGGER_UI', str(DEBUG).lower()) == 'true'
+
+# Requests slower than this many seconds are logged with their statements.
+METRICS_SLOW_REQUEST_SECONDS = float(
+    os.getenv('METRICS_SLOW_REQUEST_SECONDS', 1.0))
+
+# Bearer token of the catalogue export and the /internal endpoints, e.g.
+# curl -H "Authorization: Bearer $INTERNAL_TOKEN" .../export/shows.csv.
+# They are not served when it is unset.
+INTERNAL_TOKEN = os.getenv('INTERNAL_TOKEN')
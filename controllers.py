@@ -2,8 +2,14 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from server import app
+import hmac
+from functools import wraps
 from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    stream_with_context,
     render_template,
     request,
     flash,
@@ -11,44 +17,121 @@ from flask import (
     url_for,
     jsonify
 )
-import babel
-import dateutil.parser
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from models import Venue, Artist, Show, db
 from services import (
-    get_all_venues,
+    stream_all_venues,
+    get_venue_facets,
     get_search_venues,
     get_full_venue,
     get_search_artists,
-    get_all_artists,
+    stream_all_artists,
+    get_artist_facets,
     get_full_artist,
-    get_all_shows
+    stream_all_shows,
+    collect_page,
+    get_venue_artist_ids,
+    invalidate_venue,
+    invalidate_artist
 )
-from forms import *
-import logging
-from logging import Formatter, FileHandler
+from cache import cache
+from poolstats import poolstats
+from metrics import metrics
+from changefeed import record_change
+from conditional import conditional
+from exporter import MODELS, FORMATS, export
+from forms import VenueForm, ArtistForm, ShowForm
+from enums import GENRE_NAMES, STATE_NAMES
+from filters import format_datetime
+from templating import stream_template
+
+bp = Blueprint('main', __name__)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+bp.add_app_template_filter(format_datetime, 'datetime')
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+
+def read_filters():
+    """
+    Reads the facet filters of a listing from the query string.
+
+    Input: genre: Genre the rows must have, repeated for several.
+           state: State of the rows.
+           seeking: 'true' or 'false', the rows' seeking flag.
+
+    Returns: Dictionary of the genres (sorted tuple), state and seeking
+             filters, unknown values being ignored.
+    """
+    state = request.args.get('state')
+    return {
+        'genres': tuple(sorted(
+            set(request.args.getlist('genre')) & GENRE_NAMES)),
+        'state': state if state in STATE_NAMES else None,
+        'seeking': {'true': True, 'false': False}.get(
+            request.args.get('seeking', '').lower()),
+    }
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def internal(view):
+    """
+    Restricts a view to the requests bearing the INTERNAL_TOKEN, e.g. the
+    catalogue export and the cache and pool stats.
+
+    Returns: The view, answering 404 when no token is configured and 403
+             to the requests without it.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        token = current_app.config.get('INTERNAL_TOKEN')
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(
+                request.headers.get('Authorization', '').encode(),
+                'Bearer {}'.format(token).encode()):
+            abort(403)
+        return view(*args, **kwargs)
+    return decorated
+
+
+def render_page(template, name, page, filters=None, facets=None):
+    """
+    Renders one page of a paginated listing, or its JSON variant.
+
+    Args: template: Template used for the HTML variant.
+          name: Name the page's data is passed to the template as.
+          page: Dictionary returned by a streaming service with the data and
+                the next and previous page cursors.
+          filters: Facet filters of the listing, see read_filters.
+          facets: Function returning the facet counts of the filtered
+                  listing, only called when they are not cached.
+
+    Returns: JSON of the page, with the filters and facet counts, when
+             requested with ?format=json, the template streamed as the
+             rows are read otherwise.
+    """
+    if request.args.get('format') == 'json':
+        data = collect_page(page)
+        if facets is not None:
+            data.update(filters=filters, facets=facets())
+        return jsonify(data)
+    return Response(stream_template(
+        template, page=page, filters=filters, facets=facets,
+        **{name: page['data']}))
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
+@bp.route('/')
 def index():
     """
     Renders homepage of Fyyur App.
@@ -59,54 +142,72 @@ def index():
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues')
+@bp.route('/venues')
+@conditional('listing', 'venues')
 def venues():
     """
     Renders Venues list page.
 
-    Returns: Renders all retrieved venues from the database 
-             in a list filtered by city and state.
+    Input: cursor: Optional query argument selecting the page.
+           genre, state, seeking: Optional filters, see read_filters.
+
+    Returns: Renders one page of venues from the database 
+             in a list grouped by city and state, with the facet counts
+             of the filters, or JSON with ?format=json.
     """
-    return render_template('pages/venues.html', areas=get_all_venues())
+    filters = read_filters()
+    return render_page('pages/venues.html', 'areas', stream_all_venues(
+        cursor=request.args.get('cursor'),
+        per_page=current_app.config['PAGE_SIZE'], **filters),
+        filters, lambda: get_venue_facets(**filters))
 
 
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/search', methods=['POST'])
 def search_venues():
     """
     Renders a page showing the search results.
 
     Input: Gets search term from the form.
 
-    On POST: Retrieves all venues that matches the search term.
+    On POST: Retrieves one page of venues matching the search term by name,
+             city and state or genres, ranked by relevance.
 
     Returns: Renders the list of retrieved venues.
 
     """
     return render_template('pages/search_venues.html',
                            results=get_search_venues(
-                               request.form['search_term']),
+                               request.form['search_term'],
+                               page=request.form.get('page', 1, type=int),
+                               per_page=current_app.config['SEARCH_PAGE_SIZE']),
                            search_term=request.form.get('search_term', ''))
 
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@conditional('detail', 'venues', 'artists', 'shows', primary=True)
 def show_venue(venue_id):
     """
     Renders a page with full details of the selected venue.
 
     Args: venue_id: ID of the selected venue.
 
+    Input: past_page: Optional query argument selecting the page of past shows.
+
     Returns: 
         Venue details: Name, City, State, Address, Phone, Genres, Website, Facebook, 
                        Image, Seeking Talent, Seeking Description, Past Shows 
                        and Upcoming Shows.
     """
-    return render_template('pages/show_venue.html', venue=get_full_venue(venue_id))
+    return render_template('pages/show_venue.html', venue=get_full_venue(
+        venue_id,
+        past_page=request.args.get('past_page', 1, type=int),
+        per_page=current_app.config['PAST_SHOWS_PAGE_SIZE']))
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
     """
         Renders new_venue.html page.
@@ -118,7 +219,7 @@ def create_venue_form():
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     """
         Creates a new venue object from user's inputs.
@@ -154,7 +255,7 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     """
         Deletes selected venue.
@@ -167,8 +268,14 @@ def delete_venue(venue_id):
     """
     success = False
     try:
+        # Read before the venue's shows are deleted with it.
+        artists = get_venue_artist_ids(venue_id)
+        # Bulk deletes bypass the unit of work, publish the change manually.
+        record_change(db.session, 'venues', int(venue_id), 'delete',
+                      artists=artists)
         Venue.query.filter_by(id=venue_id).delete()
         db.session.commit()
+        invalidate_venue(venue_id, artists)
         flash('Venue was successfully deleted!')
         success = True
     except:
@@ -183,24 +290,35 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists')
+@bp.route('/artists')
+@conditional('listing', 'artists')
 def artists():
     """
     Renders Artist list page.
 
-    Returns: Renders all retrieved artists from the database in a list.
+    Input: cursor: Optional query argument selecting the page.
+           genre, state, seeking: Optional filters, see read_filters.
+
+    Returns: Renders one page of artists from the database in a list,
+             with the facet counts of the filters, or JSON with
+             ?format=json.
     """
-    return render_template('pages/artists.html', artists=get_all_artists())
+    filters = read_filters()
+    return render_page('pages/artists.html', 'artists', stream_all_artists(
+        cursor=request.args.get('cursor'),
+        per_page=current_app.config['PAGE_SIZE'], **filters),
+        filters, lambda: get_artist_facets(**filters))
 
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['POST'])
 def search_artists():
     """
     Renders a page showing the search results.
 
     Input: Gets search term from the form.
 
-    On POST: Retrieves all artists that matches the search term.
+    On POST: Retrieves one page of artists matching the search term by name,
+             city and state or genres, ranked by relevance.
 
     Returns: Renders the list of retrieved artists.
 
@@ -208,30 +326,38 @@ def search_artists():
     return render_template(
         'pages/search_artists.html',
         results=get_search_artists(
-            request.form['search_term']),
+            request.form['search_term'],
+            page=request.form.get('page', 1, type=int),
+            per_page=current_app.config['SEARCH_PAGE_SIZE']),
         search_term=request.form.get('search_term', '')
     )
 
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@conditional('detail', 'venues', 'artists', 'shows', primary=True)
 def show_artist(artist_id):
     """
     Renders a page with full details of the selected artist.
 
     Args: artist_id: ID of the selected artist.
 
+    Input: past_page: Optional query argument selecting the page of past shows.
+
     Returns: 
         Artist details: Name, City, State, Phone, Genres, Website, Facebook, 
                         Image, Seeking Talent, Seeking Description, Past Shows 
                         and Upcoming Shows.
     """
-    return render_template('pages/show_artist.html', artist=get_full_artist(artist_id))
+    return render_template('pages/show_artist.html', artist=get_full_artist(
+        artist_id,
+        past_page=request.args.get('past_page', 1, type=int),
+        per_page=current_app.config['PAST_SHOWS_PAGE_SIZE']))
 
 #  Update
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     """
     Renders form for updating an artist.
@@ -248,7 +374,7 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     """
     Updates the selected artist object from user's inputs.
@@ -268,6 +394,7 @@ def edit_artist_submission(artist_id):
             artist = Artist.query.get(artist_id)
             form.populate_obj(artist)
             db.session.commit()
+            invalidate_artist(artist_id)
             flash('Artist ' + artist.name + ' was successfully updated!')
         except:
             db.session.rollback()
@@ -280,11 +407,11 @@ def edit_artist_submission(artist_id):
         for field, err in form.errors.items():
             message.append(field + ' ' + '|'.join(err))
         flash('Errors ' + str(message))
-        return redirect(url_for('edit_artist', artist_id=artist_id))
-    return redirect(url_for('show_artist', artist_id=artist_id))
+        return redirect(url_for('.edit_artist', artist_id=artist_id))
+    return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     """
     Renders form for updating a venue.
@@ -301,7 +428,7 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     """
     Updates the selected venue object from user's inputs.
@@ -321,6 +448,7 @@ def edit_venue_submission(venue_id):
             venue = Venue.query.get(venue_id)
             form.populate_obj(venue)
             db.session.commit()
+            invalidate_venue(venue_id)
             flash('Venue ' + venue.name + ' was successfully updated!')
         except:
             db.session.rollback()
@@ -333,14 +461,14 @@ def edit_venue_submission(venue_id):
         for field, err in form.errors.items():
             message.append(field + ' ' + '|'.join(err))
         flash('Errors ' + str(message))
-        return redirect(url_for('edit_venue', venue_id=venue_id))
-    return redirect(url_for('show_venue', venue_id=venue_id))
+        return redirect(url_for('.edit_venue', venue_id=venue_id))
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
     """
     Renders form for creating a new artist.
@@ -353,7 +481,7 @@ def create_artist_form():
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     """
     creates a new artist object from user's inputs.
@@ -391,18 +519,24 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
-@app.route('/shows')
+@bp.route('/shows')
+@conditional('listing', 'venues', 'artists', 'shows')
 def shows():
     """
-    Renders all Shows registered in the database.
+    Renders Shows registered in the database.
+
+    Input: cursor: Optional query argument selecting the page.
 
-    Returns: Renders all retrieved shows from the database in a list 
-             showing the name of artist and venues in the show.
+    Returns: Renders one page of shows from the database in a list 
+             showing the name of artist and venues in the show,
+             or JSON with ?format=json.
     """
-    return render_template('pages/shows.html', shows=get_all_shows())
+    return render_page('pages/shows.html', 'shows', stream_all_shows(
+        cursor=request.args.get('cursor'),
+        per_page=current_app.config['PAGE_SIZE']))
 
 
-@app.route('/shows/create')
+@bp.route('/shows/create')
 def create_shows():
     """
     Renders form for creating a new show.
@@ -415,7 +549,7 @@ def create_shows():
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
     """
     creates a new show object from user's inputs.
@@ -434,6 +568,8 @@ def create_show_submission():
             form.populate_obj(show)
             db.session.add(show)
             db.session.commit()
+            cache.invalidate('venue', form.venue_id.data)
+            cache.invalidate('artist', form.artist_id.data)
             flash('Show was successfully listed!')
         except:
             db.session.rollback()
@@ -450,7 +586,88 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Export
+#  ----------------------------------------------------------------
+
+
+@bp.route('/export/<kind>.<format>')
+@internal
+def export_catalogue(kind, format):
+    """
+    Streams a full dump of venues, artists or shows.
+
+    Args: kind: 'venues', 'artists' or 'shows'.
+          format: 'csv' or 'ndjson'.
+
+    Returns: The dump as an attachment, generated while it is sent.
+    """
+    if kind not in MODELS or format not in FORMATS:
+        abort(404)
+    return Response(
+        stream_with_context(export(kind, format)),
+        mimetype=FORMATS[format],
+        headers={'Content-Disposition':
+                 'attachment; filename={}.{}'.format(kind, format)})
+
+#  Internal
+#  ----------------------------------------------------------------
+
+
+@bp.route('/internal/cache')
+@internal
+def cache_stats():
+    """
+    Returns: JSON with the hit, miss and eviction counters of the cache.
+    """
+    return jsonify(cache.stats())
+
+
+@bp.route('/internal/pool')
+@internal
+def pool_stats():
+    """
+    Returns: JSON with the connection pool's state, counters and
+             checkout wait time histogram.
+    """
+    return jsonify(poolstats.stats())
+
+
+@bp.route('/health/live')
+def liveness():
+    """
+    Liveness check: answers as long as the worker serves requests, without
+    touching the database so a database outage does not restart workers.
+
+    Returns: JSON status.
+    """
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/health/ready')
+def readiness():
+    """
+    Readiness check: whether a pooled database connection answers.
+
+    Returns: JSON status, with a 503 if the database is unreachable.
+    """
+    try:
+        db.session.execute(text('SELECT 1'))
+    except SQLAlchemyError:
+        current_app.logger.exception('Readiness check failed')
+        return jsonify({'status': 'unavailable'}), 503
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """
+    Returns: Request, SQL, rendering, cache and pool metrics of this
+             process in the Prometheus text format.
+    """
+    return Response(metrics.export(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     """
     renders 404.html on 404 error if data is not found.
@@ -458,21 +675,10 @@ def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     """
     renders 500.html on 500 error if an internal server error occured.
     """
     return render_template('errors/500.html'), 500
 
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
@@ -0,0 +1,75 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+from functools import lru_cache
+from hashlib import sha1
+from importlib.util import find_spec
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    render_template,
+    request,
+    url_for
+)
+
+#----------------------------------------------------------------------------#
+# API Docs.
+#----------------------------------------------------------------------------#
+
+# The Swagger UI assets shipped with Flasgger, used without importing it.
+SWAGGER_UI_STATIC = os.path.join(
+    find_spec('flasgger').submodule_search_locations[0], 'ui3', 'static')
+
+bp = Blueprint('docs', __name__)
+
+# Registered only when SWAGGER_UI is enabled.
+ui_bp = Blueprint('swagger_ui', __name__, static_folder=SWAGGER_UI_STATIC,
+                  static_url_path='/apidocs/static')
+
+
+@lru_cache(maxsize=None)
+def load_spec(path):
+    """
+    Reads the prebuilt OpenAPI document once per process.
+
+    Args: path: Path of the document written by flask openapi.
+
+    Returns: Tuple of (document bytes, ETag), or None if it was not built.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return data, sha1(data).hexdigest()
+
+
+@bp.route('/openapi.json')
+def openapi_spec():
+    """
+    Returns: The prebuilt OpenAPI document, answering conditional requests
+             with a 304.
+    """
+    spec = load_spec(current_app.config['OPENAPI_SPEC_PATH'])
+    if spec is None:
+        current_app.logger.warning('OpenAPI document missing, '
+                                   'build it with flask openapi')
+        abort(404)
+    data, etag = spec
+    response = Response(data, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+
+@ui_bp.route('/apidocs/')
+def apidocs():
+    """
+    Renders the Swagger UI, showing the prebuilt document.
+    """
+    return render_template('docs/apidocs.html',
+                           spec_url=url_for('docs.openapi_spec'))
@@ -83,4 +83,10 @@ class State(enum.Enum):
 
     @classmethod
     def choices(cls):
-        return [(choice.name, choice.value) for choice in cls]
\ No newline at end of file
+        return [(choice.name, choice.value) for choice in cls]
+
+# Choice tables and valid names, computed once instead of on every form.
+GENRE_CHOICES = Genre.choices()
+STATE_CHOICES = State.choices()
+GENRE_NAMES = frozenset(name for name, _ in GENRE_CHOICES)
+STATE_NAMES = frozenset(name for name, _ in STATE_CHOICES)
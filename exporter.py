@@ -0,0 +1,98 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+from models import Venue, Artist, Show, db
+from forms import DATETIME_FORMAT
+from importer import VENUE_COLUMNS, ARTIST_COLUMNS, SHOW_COLUMNS
+
+#----------------------------------------------------------------------------#
+# Tables.
+#----------------------------------------------------------------------------#
+
+# Same columns as the importer, plus the id the shows refer to, loaded by
+# import --keep-ids.
+MODELS = {
+    'venues': (Venue, ('id',) + VENUE_COLUMNS),
+    'artists': (Artist, ('id',) + ARTIST_COLUMNS),
+    'shows': (Show, ('id',) + SHOW_COLUMNS),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+BATCH_SIZE = 1000
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+
+def iter_rows(kind, batch_size=BATCH_SIZE):
+    """
+    Streams every row of a table through a server-side cursor, so memory
+    stays flat no matter the table size.
+
+    Args: kind: 'venues', 'artists' or 'shows'.
+          batch_size: Number of rows fetched per round trip.
+
+    Returns: Iterator of row tuples in the order of MODELS[kind] columns.
+    """
+    model, columns = MODELS[kind]
+    return db.session.query(
+        *[getattr(model, c) for c in columns]
+    ).order_by(model.id).execution_options(
+        stream_results=True).yield_per(batch_size)
+
+
+def to_text(value):
+    """
+    Args: value: Python value of a column.
+
+    Returns: The value as written to CSV, in the format the importer reads.
+    """
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def export(kind, format, batch_size=BATCH_SIZE):
+    """
+    Exports a table as CSV (with a header line) or NDJSON.
+
+    Args: kind: 'venues', 'artists' or 'shows'.
+          format: 'csv' or 'ndjson'.
+          batch_size: Number of rows per yielded chunk.
+
+    Returns: Iterator of text chunks.
+    """
+    columns = MODELS[kind][1]
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow([to_text(v) for v in row])
+    else:
+        write = lambda row: buffer.write(json.dumps(
+            dict(zip(columns, map(to_json, row)))) + '\n')
+    for i, row in enumerate(iter_rows(kind, batch_size), 1):
+        write(row)
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
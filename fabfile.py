@@ -13,6 +13,22 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(scale=1, compare=None):
+    command = "python benchmarks/run.py --scale {} -o bench_results.json".format(
+        scale)
+    if compare:
+        command += " --compare {}".format(compare)
+    local(command)
+
+
+def openapi():
+    local("flask openapi")
+
+
+def assets():
+    local("flask assets")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -24,6 +40,8 @@ def push():
 
 def prepare():
     test()
+    openapi()
+    assets()
     commit()
     push()
 
@@ -0,0 +1,48 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    """
+    Args: format: Name in DATETIME_FORMATS or a Babel pattern.
+          locale: Locale identifier.
+
+    Returns: The parsed Babel pattern and locale, built once per pair.
+    """
+    # Babel is imported by the first rendering rather than at startup.
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return (parse_pattern(DATETIME_FORMATS.get(format, format)),
+            Locale.parse(locale))
+
+
+def format_datetime(value, format='medium', locale='en'):
+    """
+    Jinja filter formatting show times.
+
+    Args: value: datetime to format. Strings are still accepted and parsed
+                 for callers that serialized the value.
+          format: Name in DATETIME_FORMATS or a Babel pattern.
+          locale: Locale identifier.
+
+    Returns: The formatted date and time.
+    """
+    if not isinstance(value, datetime):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
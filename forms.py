@@ -2,7 +2,7 @@ from datetime import datetime
 from flask_wtf import FlaskForm as Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
 from wtforms.validators import DataRequired, AnyOf, URL
-from enums import Genre, State
+from enums import GENRE_CHOICES, STATE_CHOICES, GENRE_NAMES, STATE_NAMES
 import re
 
 class ShowForm(Form):
@@ -27,7 +27,7 @@ class VenueForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=State.choices()
+        choices=STATE_CHOICES
     )
     address = StringField(
         'address', validators=[DataRequired()]
@@ -40,7 +40,7 @@ class VenueForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=Genre.choices()
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -63,10 +63,10 @@ class VenueForm(Form):
         if not is_valid_phone(self.phone.data):
             self.phone.errors.append('Invalid phone.')
             return False
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not set(self.genres.data).issubset(GENRE_NAMES):
             self.genres.errors.append('Invalid genres.')
             return False
-        if self.state.data not in dict(State.choices()).keys():
+        if self.state.data not in STATE_NAMES:
             self.state.errors.append('Invalid state.')
             return False
         return True
@@ -80,7 +80,7 @@ class ArtistForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=State.choices()
+        choices=STATE_CHOICES
     )
     phone = StringField(
         'phone'
@@ -90,7 +90,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=Genre.choices()
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -114,10 +114,10 @@ class ArtistForm(Form):
         if not is_valid_phone(self.phone.data):
             self.phone.errors.append('Invalid phone.')
             return False
-        if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+        if not set(self.genres.data).issubset(GENRE_NAMES):
             self.genres.errors.append('Invalid genres.')
             return False
-        if self.state.data not in dict(State.choices()).keys():
+        if self.state.data not in STATE_NAMES:
             self.state.errors.append('Invalid state.')
             return False
         return True
@@ -137,4 +137,55 @@ def is_valid_phone(number):
     Note: (? = optional) - Learn more: https://regex101.com/
     """
     regex = re.compile('^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
-    return regex.match(number)
\ No newline at end of file
+    return regex.match(number)
+
+#----------------------------------------------------------------------------#
+# Row validation.
+#----------------------------------------------------------------------------#
+
+# Same rules as VenueForm, ArtistForm and ShowForm for rows that do not come
+# from a form, e.g. bulk imports. Each function returns a list of errors.
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_url = URL()
+
+
+def is_valid_url(value):
+    """ Validate URLs like the URL() validator of the forms. """
+    match = _url.regex.match(value or '')
+    return bool(match) and bool(_url.validate_hostname(match.group('host')))
+
+
+def _validate_entity(row, required):
+    errors = [field + ' This field is required.'
+              for field in required if not row.get(field)]
+    if errors:
+        return errors
+    if not is_valid_phone(row.get('phone') or ''):
+        errors.append('phone Invalid phone.')
+    if not row['genres'] or not set(row['genres']).issubset(GENRE_NAMES):
+        errors.append('genres Invalid genres.')
+    if row['state'] not in STATE_NAMES:
+        errors.append('state Invalid state.')
+    if not is_valid_url(row.get('facebook_link')):
+        errors.append('facebook_link Invalid URL.')
+    return errors
+
+
+def validate_venue_row(row):
+    return _validate_entity(
+        row, ('name', 'city', 'state', 'address', 'genres'))
+
+
+def validate_artist_row(row):
+    return _validate_entity(row, ('name', 'city', 'state', 'genres'))
+
+
+def validate_show_row(row):
+    errors = []
+    for field in ('artist_id', 'venue_id'):
+        if not isinstance(row.get(field), int):
+            errors.append(field + ' Not a valid integer value.')
+    if not isinstance(row.get('start_time'), datetime):
+        errors.append('start_time Not a valid datetime value.')
+    return errors
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Production server, loaded by gunicorn from the working directory:
+#     gunicorn
+# Settings can be overridden on the command line or with GUNICORN_CMD_ARGS.
+#----------------------------------------------------------------------------#
+
+import multiprocessing
+import os
+
+wsgi_app = 'app:app'
+bind = '0.0.0.0:{}'.format(os.getenv('PORT', 8000))
+
+# One process per core plus one, a few threads each for requests waiting on
+# the database. WEB_CONCURRENCY is what Heroku and most PaaS set.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Restart workers now and then to bound memory growth, staggered.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Import the app and compile its templates once in the master, the
+# workers share them copy-on-write.
+preload_app = True
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+
+
+def when_ready(server):
+    from app import app
+    from assets import assets
+    from warmup import warm_templates
+    server.log.info('Compiled %d templates', warm_templates(app))
+    # Built here when missing, the workers inherit the loaded manifest.
+    server.log.info('Loaded %d assets', len(assets.load()['assets']))
+
+
+def post_fork(server, worker):
+    # Connections opened by the master must not be shared by the workers.
+    from app import app
+    from models import db
+    with app.app_context():
+        db.get_engine(app).dispose()
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts connections.
+    from app import app
+    from warmup import warm_up
+    worker.log.info('Warmed up: %s', warm_up(app))
@@ -0,0 +1,221 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from models import db
+from forms import (
+    DATETIME_FORMAT,
+    validate_venue_row,
+    validate_artist_row,
+    validate_show_row
+)
+
+#----------------------------------------------------------------------------#
+# Tables.
+#----------------------------------------------------------------------------#
+
+VENUE_COLUMNS = (
+    'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+    'website_link', 'facebook_link', 'seeking_talent', 'seeking_description'
+)
+ARTIST_COLUMNS = (
+    'name', 'city', 'state', 'phone', 'genres', 'image_link',
+    'website_link', 'facebook_link', 'seeking_venue', 'seeking_description'
+)
+SHOW_COLUMNS = ('artist_id', 'venue_id', 'start_time')
+
+# kind: (table, columns, validator)
+TABLES = {
+    'venues': ('venues', VENUE_COLUMNS, validate_venue_row),
+    'artists': ('artists', ARTIST_COLUMNS, validate_artist_row),
+    'shows': ('shows', SHOW_COLUMNS, validate_show_row),
+}
+
+#----------------------------------------------------------------------------#
+# Parsing.
+#----------------------------------------------------------------------------#
+
+
+class InvalidRecord:
+    """
+    Line of a file that holds no record, rejected with its batch's errors.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(file, format):
+    """
+    Streams the records of a CSV (with a header line) or NDJSON file.
+
+    Args: file: Open text file.
+          format: 'csv' or 'ndjson'.
+
+    Returns: Iterator of (line number, dictionary) tuples, an InvalidRecord
+             instead of the dictionary for a line that is not a JSON object.
+    """
+    if format == 'ndjson':
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = InvalidRecord('Invalid JSON: {} at column {}'.format(
+                    e.msg, e.colno))
+            else:
+                if not isinstance(row, dict):
+                    row = InvalidRecord('Not a JSON object')
+            yield line_number, row
+    else:
+        for line_number, row in enumerate(csv.DictReader(file), 2):
+            yield line_number, row
+
+
+def coerce(row):
+    """
+    Converts the textual values of a CSV record to the types the forms
+    produce. Values of NDJSON records already having them are kept.
+
+    Args: row: Dictionary of the record.
+
+    Returns: Dictionary with stripped strings, genres as a list, booleans,
+             integer ids and start_time as a datetime when parseable.
+    """
+    row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}
+    genres = row.get('genres')
+    if isinstance(genres, str):
+        row['genres'] = [g.strip() for g in genres.split(',') if g.strip()]
+    for field in ('seeking_talent', 'seeking_venue'):
+        # Same false values as the BooleanField of the forms.
+        row[field] = row.get(field) not in (None, False, 'false', '')
+    for field in ('id', 'artist_id', 'venue_id'):
+        value = row.get(field)
+        if isinstance(value, str) and value.isdigit():
+            row[field] = int(value)
+    start_time = row.get('start_time')
+    if isinstance(start_time, str):
+        try:
+            row['start_time'] = datetime.strptime(start_time, DATETIME_FORMAT)
+        except ValueError:
+            try:
+                row['start_time'] = datetime.fromisoformat(start_time)
+            except ValueError:
+                pass
+    return row
+
+
+def valid_id(value):
+    """
+    Returns: Whether the value is a positive integer id.
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and \
+        value > 0
+
+
+def to_copy_value(value):
+    """
+    Args: value: Python value of a column.
+
+    Returns: The value formatted for COPY ... WITH (FORMAT csv).
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for v in value) + '}'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+
+def import_rows(kind, rows, batch_size=10000, keep_ids=False):
+    """
+    Validates records and loads the valid ones with COPY, one transaction
+    per batch so a failing batch does not discard the others.
+
+    Args: kind: 'venues', 'artists' or 'shows'.
+          rows: Iterator of (line number, dictionary) tuples.
+          batch_size: Number of records per batch.
+          keep_ids: Load the records' id column instead of numbering them,
+                    e.g. to load a dump made by the export command, whose
+                    shows refer to the dumped venues and artists by id.
+                    The id sequence is then moved past the loaded ids.
+
+    Returns: Iterator of one report per batch: a dictionary with the batch
+             number, the number of records read and loaded, and the errors
+             as (line number, message) tuples.
+    """
+    table, columns, validate = TABLES[kind]
+    if keep_ids:
+        columns = ('id',) + columns
+    copy_sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table, ', '.join(columns))
+    connection = db.engine.raw_connection()
+    try:
+        batch_number = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            batch_number += 1
+            errors = []
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            loaded = 0
+            for line_number, row in batch:
+                if isinstance(row, InvalidRecord):
+                    errors.append((line_number, row.message))
+                    continue
+                row = coerce(row)
+                row_errors = validate(row)
+                if keep_ids and not valid_id(row.get('id')):
+                    row_errors.append('id Not a valid integer value.')
+                if row_errors:
+                    errors.extend((line_number, e) for e in row_errors)
+                    continue
+                writer.writerow([to_copy_value(row.get(c)) for c in columns])
+                loaded += 1
+            if loaded:
+                buffer.seek(0)
+                cursor = connection.cursor()
+                try:
+                    cursor.copy_expert(copy_sql, buffer)
+                    connection.commit()
+                except Exception as e:
+                    connection.rollback()
+                    errors.append((batch[0][0], 'Batch rejected: ' + str(e)))
+                    loaded = 0
+                finally:
+                    cursor.close()
+            yield {
+                'batch': batch_number,
+                'read': len(batch),
+                'loaded': loaded,
+                'errors': errors
+            }
+        if keep_ids:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST((SELECT max(id) FROM {}), 1))".format(table),
+                    (table,))
+                connection.commit()
+            finally:
+                cursor.close()
+    finally:
+        connection.close()
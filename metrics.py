@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from bisect import bisect_left
+import threading
+import time
+from flask import (
+    before_render_template,
+    template_rendered,
+    g,
+    has_request_context,
+    request
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# Upper bounds in seconds, from a millisecond to ten seconds.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    Thread safe histogram with fixed buckets, cumulative like Prometheus'.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def to_dict(self):
+        """
+        Returns: Dictionary with the cumulative count per upper bound
+                 ('+Inf' last), the sum and the count of observations.
+        """
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+                total += n
+                cumulative[str(bound)] = total
+            return {'buckets': cumulative, 'sum': self.sum,
+                    'count': self.count}
+
+
+class LabeledHistograms:
+    """
+    Histograms keyed by a label value, e.g. one per endpoint.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        histogram = self.histograms.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(
+                    label, Histogram(self.buckets))
+        histogram.observe(value)
+
+#----------------------------------------------------------------------------#
+# Request Metrics.
+#----------------------------------------------------------------------------#
+
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class RequestMetrics:
+    """
+    Records per endpoint latency, number of SQL statements, time spent in
+    the database and rendering templates, and exports them in the
+    Prometheus text format.
+
+    Configured from the app config:
+        METRICS_SLOW_REQUEST_SECONDS: Requests slower than this are logged
+            with every statement they ran, None disables the log.
+    """
+
+    def __init__(self, app=None):
+        self.latency = LabeledHistograms()
+        self.statements = LabeledHistograms(STATEMENT_BUCKETS)
+        self.db_time = LabeledHistograms()
+        self.render_time = LabeledHistograms()
+        self.slow_request_seconds = None
+        self.collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.slow_request_seconds = app.config.get(
+            'METRICS_SLOW_REQUEST_SECONDS', 1.0)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        event.listen(Engine, 'before_cursor_execute',
+                     self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute',
+                     self._after_cursor_execute)
+        event.listen(Engine, 'handle_error', self._handle_error)
+        # Signals need blinker, without it render times stay at zero.
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.extensions['metrics'] = self
+
+    def add_collector(self, collector):
+        """
+        Registers a function returning extra samples for the export, as
+        (name, type, help, value) tuples.
+        """
+        self.collectors.append(collector)
+
+    def _current(self):
+        if has_request_context():
+            return g.get('metrics')
+        return None
+
+    def _before_request(self):
+        g.metrics = {
+            'started': time.perf_counter(),
+            'statements': [],
+            'db_time': 0.0,
+            'render_time': 0.0,
+            'render_started': None,
+        }
+
+    def _after_request(self, response):
+        current = self._current()
+        if current is None:
+            return response
+        request_line = (request.endpoint or 'unknown', request.method,
+                        request.full_path)
+        if response.is_streamed and not response.direct_passthrough:
+            # A streamed body runs its statements and renders as it is
+            # sent, the request ends when the server closes it.
+            response.call_on_close(
+                lambda: self._record(current, *request_line))
+        else:
+            self._record(current, *request_line)
+        return response
+
+    def _record(self, current, endpoint, method, path):
+        elapsed = time.perf_counter() - current['started']
+        self.latency.observe(endpoint, elapsed)
+        self.statements.observe(endpoint, len(current['statements']))
+        self.db_time.observe(endpoint, current['db_time'])
+        self.render_time.observe(endpoint, current['render_time'])
+        if self.slow_request_seconds is not None and \
+                elapsed >= self.slow_request_seconds:
+            self.app.logger.warning(
+                'Slow request %s %s: %.3fs, %d statements in %.3fs, '
+                'rendering %.3fs\n%s',
+                method, path, elapsed,
+                len(current['statements']), current['db_time'],
+                current['render_time'],
+                '\n'.join('  [{:.4f}s] {}'.format(duration, statement)
+                          for statement, duration in current['statements']))
+
+    def time_render(self, chunks):
+        """
+        Times a streamed template, which sends no render signals: the time
+        spent generating its chunks, less that of the statements run
+        meanwhile, e.g. those reading its rows.
+
+        Args: chunks: Iterable of the template's chunks.
+
+        Returns: Iterator of the chunks.
+        """
+        chunks = iter(chunks)
+        while True:
+            current = self._current()
+            started = time.perf_counter()
+            db_time = current['db_time'] if current is not None else 0.0
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                if current is not None:
+                    current['render_time'] += time.perf_counter() - \
+                        started - (current['db_time'] - db_time)
+            yield chunk
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        # A connection runs one statement at a time.
+        conn.info['query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        self._count_statement(conn.info.pop('query_started'), statement)
+
+    def _handle_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute, its start
+        # must still be dropped, the connection goes back to the pool.
+        conn = exception_context.connection
+        started = conn.info.pop('query_started', None) \
+            if conn is not None else None
+        if started is not None:
+            self._count_statement(started, exception_context.statement)
+
+    def _count_statement(self, started, statement):
+        duration = time.perf_counter() - started
+        current = self._current()
+        if current is not None:
+            current['statements'].append((statement, duration))
+            current['db_time'] += duration
+
+    def _before_render(self, sender, template, context, **extra):
+        current = self._current()
+        if current is not None:
+            current['render_started'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        current = self._current()
+        if current is not None and current['render_started'] is not None:
+            current['render_time'] += \
+                time.perf_counter() - current['render_started']
+            current['render_started'] = None
+
+    def export(self):
+        """
+        Returns: Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, help, histograms in (
+                ('fyyur_request_duration_seconds',
+                 'Request latency per endpoint.', self.latency),
+                ('fyyur_request_sql_statements',
+                 'SQL statements per request.', self.statements),
+                ('fyyur_request_db_seconds',
+                 'Time spent in the database per request.', self.db_time),
+                ('fyyur_request_render_seconds',
+                 'Time spent rendering templates per request.',
+                 self.render_time)):
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} histogram'.format(name))
+            for endpoint, histogram in sorted(histograms.histograms.items()):
+                data = histogram.to_dict()
+                for bound, count in data['buckets'].items():
+                    lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(
+                        name, endpoint, bound, count))
+                lines.append('{}_sum{{endpoint="{}"}} {}'.format(
+                    name, endpoint, data['sum']))
+                lines.append('{}_count{{endpoint="{}"}} {}'.format(
+                    name, endpoint, data['count']))
+        for collector in self.collectors:
+            for name, type, help, value in collector():
+                if value is None:
+                    continue
+                lines.append('# HELP {} {}'.format(name, help))
+                lines.append('# TYPE {} {}'.format(name, type))
+                lines.append('{} {}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
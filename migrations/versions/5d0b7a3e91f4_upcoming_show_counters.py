@@ -0,0 +1,65 @@
+"""upcoming show counters
+
+Revision ID: 5d0b7a3e91f4
+Revises: e2a61f8c9d37
+Create Date: 2021-08-29 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0b7a3e91f4'
+down_revision = 'e2a61f8c9d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, fk in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.add_column(table, sa.Column(
+            'num_upcoming_shows', sa.Integer(), server_default='0',
+            nullable=False))
+        op.execute("""
+            UPDATE {table} SET num_upcoming_shows = counts.n
+            FROM (
+                SELECT {fk} AS id, count(*) AS n FROM shows
+                WHERE start_time > current_date GROUP BY {fk}
+            ) AS counts
+            WHERE {table}.id = counts.id
+        """.format(table=table, fk=fk))
+    op.execute("""
+        CREATE FUNCTION shows_upcoming_counts_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE')
+                    AND OLD.start_time > current_date THEN
+                UPDATE venues SET num_upcoming_shows = num_upcoming_shows - 1
+                WHERE id = OLD.venue_id;
+                UPDATE artists SET num_upcoming_shows = num_upcoming_shows - 1
+                WHERE id = OLD.artist_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE')
+                    AND NEW.start_time > current_date THEN
+                UPDATE venues SET num_upcoming_shows = num_upcoming_shows + 1
+                WHERE id = NEW.venue_id;
+                UPDATE artists SET num_upcoming_shows = num_upcoming_shows + 1
+                WHERE id = NEW.artist_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER shows_upcoming_counts_trigger
+        AFTER INSERT OR DELETE OR UPDATE OF venue_id, artist_id, start_time
+        ON shows
+        FOR EACH ROW EXECUTE PROCEDURE shows_upcoming_counts_update()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER shows_upcoming_counts_trigger ON shows')
+    op.execute('DROP FUNCTION shows_upcoming_counts_update()')
+    op.drop_column('artists', 'num_upcoming_shows')
+    op.drop_column('venues', 'num_upcoming_shows')
@@ -0,0 +1,67 @@
+"""search indexes
+
+Revision ID: 8b4e6d21c5a3
+Revises: 3f1c2a9d7b10
+Create Date: 2021-08-08 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d21c5a3'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+# Name, area and genres weighted A, B and C so name hits rank first.
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}name, '')), 'A') ||
+    setweight(to_tsvector('simple',
+        coalesce({row}city, '') || ' ' || coalesce({row}state, '')), 'B') ||
+    setweight(to_tsvector('simple',
+        coalesce(array_to_string({row}genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column(
+            'search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute("""
+            CREATE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {vector};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """.format(table=table, vector=SEARCH_VECTOR.format(row='NEW.')))
+        op.execute("""
+            CREATE TRIGGER {table}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF name, city, state, genres ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE {table}_search_vector_update()
+        """.format(table=table))
+        op.execute('UPDATE {table} SET search_vector = {vector}'.format(
+            table=table, vector=SEARCH_VECTOR.format(row='')))
+        op.create_index('ix_{}_search_vector'.format(table), table,
+                        ['search_vector'], postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(table), table,
+                        ['name'], postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_{}_area_trgm'.format(table), table,
+                        [sa.text("(city || ', ' || state) gin_trgm_ops")],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        op.drop_index('ix_{}_area_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.execute('DROP TRIGGER {table}_search_vector_trigger ON {table}'
+                   .format(table=table))
+        op.execute('DROP FUNCTION {table}_search_vector_update()'
+                   .format(table=table))
+        op.drop_column(table, 'search_vector')
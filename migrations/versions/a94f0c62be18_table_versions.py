@@ -0,0 +1,53 @@
+"""table versions
+
+Revision ID: a94f0c62be18
+Revises: 5d0b7a3e91f4
+Create Date: 2021-09-05 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94f0c62be18'
+down_revision = '5d0b7a3e91f4'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True),
+              server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(table_versions, [{'table_name': t} for t in TABLES])
+    op.execute("""
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions
+            SET version = version + 1, updated_at = now()
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in TABLES:
+        op.execute("""
+            CREATE TRIGGER {table}_version_trigger
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()
+        """.format(table=table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute('DROP TRIGGER {table}_version_trigger ON {table}'
+                   .format(table=table))
+    op.execute('DROP FUNCTION bump_table_version()')
+    op.drop_table('table_versions')
@@ -0,0 +1,95 @@
+"""statement level show counters
+
+Revision ID: b31e8d4f6a27
+Revises: a94f0c62be18
+Create Date: 2021-09-12 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b31e8d4f6a27'
+down_revision = 'a94f0c62be18'
+branch_labels = None
+depends_on = None
+
+# Applies the changed rows' upcoming shows per venue and artist in one
+# grouped UPDATE per statement, so bulk loads do not pay two UPDATEs per row.
+APPLY_DELTA = """
+        UPDATE venues SET num_upcoming_shows = num_upcoming_shows {sign} d.n
+        FROM (SELECT venue_id AS id, count(*) AS n FROM {rows}
+              WHERE start_time > current_date GROUP BY venue_id) AS d
+        WHERE venues.id = d.id;
+        UPDATE artists SET num_upcoming_shows = num_upcoming_shows {sign} d.n
+        FROM (SELECT artist_id AS id, count(*) AS n FROM {rows}
+              WHERE start_time > current_date GROUP BY artist_id) AS d
+        WHERE artists.id = d.id;
+"""
+
+TRIGGERS = (
+    ('insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+    ('delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+    ('update', 'UPDATE',
+     'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+)
+
+
+def upgrade():
+    op.execute('DROP TRIGGER shows_upcoming_counts_trigger ON shows')
+    op.execute('DROP FUNCTION shows_upcoming_counts_update()')
+    op.execute("""
+        CREATE FUNCTION shows_upcoming_counts_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                {old}
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                {new}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(old=APPLY_DELTA.format(sign='-', rows='old_rows'),
+               new=APPLY_DELTA.format(sign='+', rows='new_rows')))
+    for name, event, referencing in TRIGGERS:
+        op.execute("""
+            CREATE TRIGGER shows_upcoming_counts_{name}
+            AFTER {event} ON shows {referencing}
+            FOR EACH STATEMENT EXECUTE PROCEDURE shows_upcoming_counts_update()
+        """.format(name=name, event=event, referencing=referencing))
+
+
+def downgrade():
+    for name, _, _ in TRIGGERS:
+        op.execute('DROP TRIGGER shows_upcoming_counts_{} ON shows'
+                   .format(name))
+    op.execute('DROP FUNCTION shows_upcoming_counts_update()')
+    op.execute("""
+        CREATE FUNCTION shows_upcoming_counts_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE')
+                    AND OLD.start_time > current_date THEN
+                UPDATE venues SET num_upcoming_shows = num_upcoming_shows - 1
+                WHERE id = OLD.venue_id;
+                UPDATE artists SET num_upcoming_shows = num_upcoming_shows - 1
+                WHERE id = OLD.artist_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE')
+                    AND NEW.start_time > current_date THEN
+                UPDATE venues SET num_upcoming_shows = num_upcoming_shows + 1
+                WHERE id = NEW.venue_id;
+                UPDATE artists SET num_upcoming_shows = num_upcoming_shows + 1
+                WHERE id = NEW.artist_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER shows_upcoming_counts_trigger
+        AFTER INSERT OR DELETE OR UPDATE OF venue_id, artist_id, start_time
+        ON shows
+        FOR EACH ROW EXECUTE PROCEDURE shows_upcoming_counts_update()
+    """)
@@ -0,0 +1,28 @@
+"""keyset pagination indexes
+
+Revision ID: c7d93e5f0a42
+Revises: 8b4e6d21c5a3
+Create Date: 2021-08-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d93e5f0a42'
+down_revision = '8b4e6d21c5a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venues_area_id', 'venues', ['city', 'state', 'id'])
+    op.create_index('ix_artists_name_id', 'artists', ['name', 'id'])
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_artists_name_id', table_name='artists')
+    op.drop_index('ix_venues_area_id', table_name='venues')
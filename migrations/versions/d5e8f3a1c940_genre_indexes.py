@@ -0,0 +1,33 @@
+"""genre indexes
+
+Revision ID: d5e8f3a1c940
+Revises: b31e8d4f6a27
+Create Date: 2021-09-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e8f3a1c940'
+down_revision = 'b31e8d4f6a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, outside the migration's transaction, so the
+    # catalogue stays writable while large tables are indexed.
+    with op.get_context().autocommit_block():
+        for table in ('venues', 'artists'):
+            op.create_index('ix_{}_genres'.format(table), table, ['genres'],
+                            postgresql_using='gin',
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artists', 'venues'):
+            op.drop_index('ix_{}_genres'.format(table), table_name=table,
+                          postgresql_concurrently=True)
@@ -2,7 +2,38 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask_sqlalchemy import SQLAlchemy
+import flask_sqlalchemy
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+#----------------------------------------------------------------------------#
+# Session.
+#----------------------------------------------------------------------------#
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session sending the queries of read-only service functions to a read
+    replica when one is configured and usable, see replicas.py. Flushes and
+    every other query go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        router = self.app.extensions.get('replicas')
+        if router is not None and self.info.get('read_only') and \
+                not self._flushing:
+            engine = router.engine_for_read()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
 
 db = db = SQLAlchemy()
 
@@ -13,6 +44,17 @@ db = db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_area_trgm',
+                 db.text("(city || ', ' || state) gin_trgm_ops"),
+                 postgresql_using='gin'),
+        db.Index('ix_venues_area_id', 'city', 'state', 'id'),
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -26,16 +68,29 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(500), nullable=True)
+    # Maintained by triggers on shows, see refresh_upcoming_counts.
+    num_upcoming_shows = db.Column(
+        db.Integer, nullable=False, server_default='0')
+    # Maintained by a database trigger, see the search indexes migration.
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
 
     def __repr__(self) -> str:
-        return str(self.to_dict())
-
-    def to_dict(self):
-        return vars(self)
+        return f'<Venue {self.id} {self.name!r}>'
 
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_area_trgm',
+                 db.text("(city || ', ' || state) gin_trgm_ops"),
+                 postgresql_using='gin'),
+        db.Index('ix_artists_name_id', 'name', 'id'),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -48,16 +103,23 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120), nullable=True)
     seeking_venue = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(500), nullable=True)
+    # Maintained by triggers on shows, see refresh_upcoming_counts.
+    num_upcoming_shows = db.Column(
+        db.Integer, nullable=False, server_default='0')
+    # Maintained by a database trigger, see the search indexes migration.
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
 
     def __repr__(self) -> str:
-        return str(self.to_dict())
-
-    def to_dict(self):
-        return vars(self)
+        return f'<Artist {self.id} {self.name!r}>'
 
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(
@@ -69,7 +131,18 @@ class Show(db.Model):
     start_time = db.Column(db.DateTime, nullable=False)
 
     def __repr__(self) -> str:
-        return str(self.to_dict())
+        return (f'<Show {self.id} artist={self.artist_id} '
+                f'venue={self.venue_id} at {self.start_time}>')
 
-    def to_dict(self):
-        return vars(self)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    # Bumped by a statement level trigger on every write to the table.
+    table_name = db.Column(db.String(63), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           server_default=db.func.now())
+
+    def __repr__(self) -> str:
+        return f'<TableVersion {self.table_name} {self.version}>'
@@ -0,0 +1,125 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import inspect
+import json
+import re
+from sqlalchemy import ARRAY, Boolean, DateTime, Integer, String
+from models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# OpenAPI Document.
+#----------------------------------------------------------------------------#
+
+# Models documented as schemas, and the routes the docs leave out.
+MODELS = (Venue, Artist, Show)
+EXCLUDED_ENDPOINTS = {'static', 'docs.openapi_spec', 'swagger_ui.static',
+                      'swagger_ui.apidocs', 'assets.asset'}
+HIDDEN_METHODS = {'HEAD', 'OPTIONS'}
+
+CONVERTER_TYPES = {'int': 'integer', 'float': 'number'}
+RULE_ARGUMENT = re.compile(r'<(?:(\w+):)?(\w+)>')
+
+
+def column_schema(column):
+    """
+    Args: column: SQLAlchemy column.
+
+    Returns: JSON schema of the column's values, None for types that are
+             not exposed, e.g. search vectors.
+    """
+    type_ = column.type
+    if isinstance(type_, ARRAY):
+        return {'type': 'array', 'items': {'type': 'string'}}
+    if isinstance(type_, Boolean):
+        return {'type': 'boolean'}
+    if isinstance(type_, Integer):
+        return {'type': 'integer'}
+    if isinstance(type_, DateTime):
+        return {'type': 'string', 'format': 'date-time'}
+    if isinstance(type_, String):
+        schema = {'type': 'string'}
+        if type_.length:
+            schema['maxLength'] = type_.length
+        return schema
+    return None
+
+
+def model_schema(model):
+    """
+    Returns: JSON schema of the model's columns.
+    """
+    properties, required = {}, []
+    for column in model.__table__.columns:
+        schema = column_schema(column)
+        if schema is None:
+            continue
+        properties[column.name] = schema
+        if not column.nullable:
+            required.append(column.name)
+    return {'type': 'object', 'properties': properties, 'required': required}
+
+
+def operation(rule, method, view):
+    """
+    Describes a route for one method from the view's docstring.
+
+    Returns: OpenAPI operation object.
+    """
+    lines = (inspect.getdoc(view) or rule.endpoint).splitlines()
+    op = {
+        'operationId': '{}_{}'.format(
+            rule.endpoint.rpartition('.')[2], method.lower()),
+        'summary': lines[0].strip(),
+        'responses': {'200': {'description': 'OK'}},
+    }
+    description = '\n'.join(lines[1:]).strip()
+    if description:
+        op['description'] = description
+    parameters = [
+        {'name': name, 'in': 'path', 'required': True,
+         'schema': {'type': CONVERTER_TYPES.get(converter, 'string')}}
+        for converter, name in RULE_ARGUMENT.findall(rule.rule)
+    ]
+    if parameters:
+        op['parameters'] = parameters
+    if method == 'POST':
+        op['requestBody'] = {'content': {
+            'application/x-www-form-urlencoded': {
+                'schema': {'type': 'object'}}}}
+    return op
+
+
+def build_spec(app):
+    """
+    Builds the OpenAPI document of the app from its routes, their
+    docstrings and the models.
+
+    Args: app: The app.
+
+    Returns: Dictionary of the OpenAPI 3 document.
+    """
+    paths = {}
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint in EXCLUDED_ENDPOINTS:
+            continue
+        view = app.view_functions[rule.endpoint]
+        path = paths.setdefault(RULE_ARGUMENT.sub(r'{\2}', rule.rule), {})
+        for method in sorted(rule.methods - HIDDEN_METHODS):
+            path[method.lower()] = operation(rule, method, view)
+    return {
+        'openapi': '3.0.3',
+        'info': {'title': 'Fyyur', 'version': '1.0.0'},
+        'paths': paths,
+        'components': {'schemas': {
+            model.__name__: model_schema(model) for model in MODELS}},
+    }
+
+
+def dump_spec(spec):
+    """
+    Returns: The document as stable JSON text, so rebuilding an unchanged
+             document yields the same file.
+    """
+    return json.dumps(spec, indent=2, sort_keys=True) + '\n'
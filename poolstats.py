@@ -0,0 +1,109 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+from metrics import Histogram
+
+#----------------------------------------------------------------------------#
+# Pool Statistics.
+#----------------------------------------------------------------------------#
+
+
+class PoolStats:
+    """
+    Live statistics of the SQLAlchemy connection pool: connections checked
+    out and in overflow, and how long checkouts waited for a connection.
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        self.wait = Histogram()
+        self.connects = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        # NullPool (PgBouncer mode) is left alone, it has nothing to wait for.
+        options.setdefault('poolclass', instrumented_pool(self))
+        app.extensions['poolstats'] = self
+
+    def stats(self):
+        """
+        Returns: Dictionary of the pool's current state and counters.
+        """
+        current = {}
+        if self.pool is not None:
+            current = {
+                'size': self.pool.size(),
+                'checked_in': self.pool.checkedin(),
+                'checked_out': self.pool.checkedout(),
+                'overflow': max(self.pool.overflow(), 0),
+            }
+        return dict(current, **{
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_seconds': self.wait.to_dict(),
+        })
+
+    def samples(self):
+        """
+        Returns: The pool's state and counters as (name, type, help, value)
+                 metric samples.
+        """
+        stats = self.stats()
+        return [
+            ('fyyur_pool_size', 'gauge', 'Pool size.', stats.get('size')),
+            ('fyyur_pool_checked_out', 'gauge', 'Connections in use.',
+             stats.get('checked_out')),
+            ('fyyur_pool_overflow', 'gauge', 'Connections above the size.',
+             stats.get('overflow')),
+            ('fyyur_pool_connects_total', 'counter', 'Connections opened.',
+             stats['connects']),
+            ('fyyur_pool_checkouts_total', 'counter', 'Connection checkouts.',
+             stats['checkouts']),
+            ('fyyur_pool_timeouts_total', 'counter', 'Checkout timeouts.',
+             stats['timeouts']),
+        ]
+
+
+def instrumented_pool(stats):
+    """
+    Args: stats: PoolStats to record into.
+
+    Returns: QueuePool subclass timing how long each checkout waited.
+    """
+    class InstrumentedQueuePool(QueuePool):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stats.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.wait.observe(time.perf_counter() - started)
+
+    @event.listens_for(InstrumentedQueuePool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(InstrumentedQueuePool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    return InstrumentedQueuePool
+
+
+poolstats = PoolStats()
@@ -0,0 +1,177 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from flask.json import JSONEncoder as BaseJSONEncoder
+
+#----------------------------------------------------------------------------#
+# Records.
+#----------------------------------------------------------------------------#
+
+
+class Record:
+    """
+    Lightweight, read-only result of a service, built straight from the
+    column tuples of a query: no identity map, no attribute instrumentation
+    and no per-instance __dict__.
+
+    Subclasses list their fields in __slots__, the leading ones being the
+    queried columns, named in columns. Templates read the fields as
+    attributes or items, jsonify and the cache see them as dictionaries.
+    """
+    __slots__ = ()
+    columns = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__init__ = make_init(cls.__slots__)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Args: rows: Rows whose leading values are the record's fields,
+                    trailing values, e.g. sort keys, are ignored.
+
+        Returns: List of records.
+        """
+        return [cls(*row) for row in rows]
+
+    def as_dict(self):
+        """
+        Returns: Dictionary of the fields, nested records included.
+        """
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name, None)
+            if isinstance(value, list):
+                value = [v.as_dict() if isinstance(v, Record) else v
+                         for v in value]
+            data[name] = value
+        return data
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __getstate__(self):
+        return tuple(getattr(self, name, None) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and \
+            self.__getstate__() == other.__getstate__()
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name, None))
+            for name in self.__slots__))
+
+
+def make_init(fields):
+    """
+    Generates the __init__ of a record type, taking the fields positionally
+    or by name, missing ones being None, and ignoring extra trailing values.
+    Assigning each slot by name, as namedtuple and dataclasses do, is several
+    times faster than a generic setattr loop.
+
+    Args: fields: Names of the fields.
+
+    Returns: The __init__ function.
+    """
+    source = 'def __init__(self, {}, *_):\n'.format(
+        ', '.join('{}=None'.format(name) for name in fields))
+    source += ''.join('    self.{0} = {0}\n'.format(name) for name in fields)
+    namespace = {}
+    exec(source, namespace)
+    return namespace['__init__']
+
+
+class JSONEncoder(BaseJSONEncoder):
+    """
+    Encodes records as objects of their fields.
+    """
+
+    def default(self, o):
+        if isinstance(o, Record):
+            return o.as_dict()
+        return super().default(o)
+
+#----------------------------------------------------------------------------#
+# Venues' Records.
+#----------------------------------------------------------------------------#
+
+# Fields added to the columns of the detail records.
+DETAIL_FIELDS = ('past_shows', 'upcoming_shows', 'past_shows_count',
+                 'upcoming_shows_count', 'past_shows_page', 'past_shows_pages')
+
+
+class VenueSummary(Record):
+    __slots__ = columns = ('id', 'name', 'num_upcoming_shows')
+
+
+class VenueDetails(Record):
+    columns = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+               'image_link', 'website_link', 'facebook_link',
+               'seeking_talent', 'seeking_description', 'num_upcoming_shows')
+    __slots__ = columns + DETAIL_FIELDS
+
+
+class VenueShow(Record):
+    """
+    Show of an artist, as listed on the artist's page.
+    """
+    __slots__ = columns = ('venue_id', 'venue_name', 'venue_image_link',
+                           'start_time')
+
+#----------------------------------------------------------------------------#
+# Artists' Records.
+#----------------------------------------------------------------------------#
+
+
+class ArtistSummary(Record):
+    __slots__ = columns = ('id', 'name')
+
+
+class ArtistSearchResult(Record):
+    __slots__ = columns = ('id', 'name', 'num_upcoming_shows')
+
+
+class ArtistDetails(Record):
+    columns = ('id', 'name', 'city', 'state', 'phone', 'genres',
+               'image_link', 'website_link', 'facebook_link',
+               'seeking_venue', 'seeking_description', 'num_upcoming_shows')
+    __slots__ = columns + DETAIL_FIELDS
+
+
+class ArtistShow(Record):
+    """
+    Show at a venue, as listed on the venue's page.
+    """
+    __slots__ = columns = ('artist_id', 'artist_name', 'artist_image_link',
+                           'start_time')
+
+#----------------------------------------------------------------------------#
+# Facets' Records.
+#----------------------------------------------------------------------------#
+
+
+class FacetCount(Record):
+    """
+    Number of venues or artists having a value of a facet, e.g. a genre.
+    """
+    __slots__ = columns = ('value', 'count')
+
+#----------------------------------------------------------------------------#
+# Shows' Records.
+#----------------------------------------------------------------------------#
+
+
+class ShowListing(Record):
+    __slots__ = columns = ('venue_id', 'venue_name', 'artist_id',
+                           'artist_name', 'artist_image_link', 'start_time',
+                           'id')
@@ -0,0 +1,224 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request, session
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from models import db
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Replica Routing.
+#----------------------------------------------------------------------------#
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Seconds the replica is behind the primary: zero when it replayed all it
+# received, otherwise the age of the last replayed transaction. Zero on a
+# database that is not a replica, e.g. a second local database.
+LAG_SQL = text(
+    'SELECT CASE '
+    'WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()), 0) END')
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of the functions decorated with reads to a read
+    replica, falling back to the primary when:
+        - the replica lags more than REPLICA_MAX_LAG_SECONDS, or its lag
+          cannot be checked;
+        - the client wrote in the last REPLICA_STICKY_SECONDS, so it reads
+          its own writes, e.g. the detail page it is redirected to after
+          an edit. Writes are requests with an unsafe method, remembered
+          in the session cookie.
+
+    Configured from the app config:
+        SQLALCHEMY_REPLICA_URI: Replica database, routing is off without.
+        REPLICA_MAX_LAG_SECONDS: Lag above which reads go to the primary.
+        REPLICA_LAG_CHECK_SECONDS: How long a lag measurement is trusted.
+        REPLICA_STICKY_SECONDS: How long a client reads from the primary
+                                after writing.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.uri = None
+        self.max_lag = 2.0
+        self.lag_check_seconds = 1.0
+        self.sticky_seconds = 5.0
+        self.lag = None
+        self.checked_at = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._lag_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+        if not self.uri:
+            return
+        self.app = app
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', self.max_lag)
+        self.lag_check_seconds = app.config.get(
+            'REPLICA_LAG_CHECK_SECONDS', self.lag_check_seconds)
+        self.sticky_seconds = app.config.get(
+            'REPLICA_STICKY_SECONDS', self.sticky_seconds)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['replicas'] = self
+
+    @property
+    def engine(self):
+        """
+        Engine of the replica, created by the first read of each process
+        with the primary's options. The pool statistics only follow the
+        primary's pool, the replica gets a plain pool.
+        """
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    options = dict(
+                        self.app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+                    if options.get('poolclass') is not NullPool:
+                        options.pop('poolclass', None)
+                    self._engine = create_engine(self.uri, **options)
+        return self._engine
+
+    def reads(self, f):
+        """
+        Decorates a service function only reading, so its queries may be
+        sent to the replica. Generator functions, e.g. streamed listings,
+        are marked while they run, each time they are resumed.
+        """
+        if inspect.isgeneratorfunction(f):
+            @wraps(f)
+            def generator(*args, **kwargs):
+                values = f(*args, **kwargs)
+                try:
+                    while True:
+                        with read_only():
+                            try:
+                                value = next(values)
+                            except StopIteration:
+                                return
+                        yield value
+                finally:
+                    values.close()
+            return generator
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with read_only():
+                return f(*args, **kwargs)
+        return wrapper
+
+    def engine_for_read(self):
+        """
+        Returns: The replica's engine if the current read may use it,
+                 None to read from the primary.
+        """
+        if has_request_context() and self._sticky_until() > time.time():
+            self.primary_reads += 1
+            return None
+        if not self.replica_usable():
+            self.primary_reads += 1
+            return None
+        self.replica_reads += 1
+        return self.engine
+
+    def replica_usable(self):
+        """
+        Returns: Whether the replica's lag, measured at most every
+                 REPLICA_LAG_CHECK_SECONDS, is within the limit.
+        """
+        now = time.monotonic()
+        if now - self.checked_at > self.lag_check_seconds:
+            with self._lag_lock:
+                if now - self.checked_at > self.lag_check_seconds:
+                    self.lag = self.measure_lag()
+                    self.checked_at = now
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def measure_lag(self):
+        """
+        Returns: Seconds the replica lags behind, None if it is unreachable.
+        """
+        try:
+            with self.engine.connect() as connection:
+                return float(connection.execute(LAG_SQL).scalar())
+        except Exception:
+            logger.warning('Replica lag check failed, reading from primary',
+                           exc_info=True)
+            return None
+
+    def _sticky_until(self):
+        until = g.get('primary_until')
+        if until is None:
+            until = g.primary_until = session.get('primary_until', 0)
+        return until
+
+    def _before_request(self):
+        if request.method not in SAFE_METHODS:
+            g.primary_until = time.time() + self.sticky_seconds
+            g.wrote = True
+
+    def _after_request(self, response):
+        if g.get('wrote'):
+            session['primary_until'] = g.primary_until
+        return response
+
+    def stats(self):
+        """
+        Returns: Dictionary of the last measured lag and the read counters.
+        """
+        return {
+            'lag_seconds': self.lag,
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads,
+        }
+
+    def samples(self):
+        """
+        Returns: The lag and counters as (name, type, help, value) metric
+                 samples.
+        """
+        stats = self.stats()
+        return [
+            ('fyyur_replica_lag_seconds', 'gauge',
+             'Last measured replica lag.', stats['lag_seconds']),
+            ('fyyur_replica_reads_total', 'counter',
+             'Read queries sent to the replica.', stats['replica_reads']),
+            ('fyyur_primary_reads_total', 'counter',
+             'Read-only queries kept on the primary.', stats['primary_reads']),
+        ]
+
+
+@contextmanager
+def read_only():
+    """
+    Marks the queries of the session run within as read-only.
+    """
+    info = db.session.info
+    previous = info.get('read_only', False)
+    info['read_only'] = True
+    try:
+        yield
+    finally:
+        info['read_only'] = previous
+
+
+replicas = ReplicaRouter()
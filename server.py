@@ -2,21 +2,84 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import logging
+from logging import Formatter, FileHandler
+import click
 from flask import Flask
-from flask.scaffold import F
-from flasgger import Swagger
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-from flask_moment import Moment
 from models import db
+from cache import cache
+from changefeed import changefeed
+from poolstats import poolstats
+from metrics import metrics
+from replicas import replicas
+from templating import fragments
+from assets import assets
+from compression import compression
+from records import JSONEncoder
 
 #----------------------------------------------------------------------------#
-# App Config.
+# App Factory.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-swagger = Swagger(app)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migrate = Migrate(app, db)
\ No newline at end of file
+
+def create_app(config='config'):
+    """
+    Creates the app and sets up its extensions, routes and commands.
+
+    Flask-Migrate (and Alembic) is only loaded by the flask CLI. The API
+    docs are served from the document prebuilt by flask openapi, the
+    Swagger UI showing it only when SWAGGER_UI is set.
+
+    Args: config: Object or import name of the configuration.
+
+    Returns: The app.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.json_encoder = JSONEncoder
+    poolstats.init_app(app)
+    db.init_app(app)
+    replicas.init_app(app)
+    cache.init_app(app)
+    changefeed.init_app(app)
+    metrics.init_app(app)
+    fragments.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    metrics.add_collector(cache.samples)
+    metrics.add_collector(fragments.samples)
+    metrics.add_collector(compression.samples)
+    metrics.add_collector(poolstats.samples)
+    if 'replicas' in app.extensions:
+        metrics.add_collector(replicas.samples)
+    init_logging(app)
+
+    from controllers import bp
+    from commands import bp as commands_bp
+    from docs import bp as docs_bp, ui_bp
+    app.register_blueprint(bp)
+    app.register_blueprint(commands_bp)
+    app.register_blueprint(docs_bp)
+    if app.config.get('SWAGGER_UI', False):
+        app.register_blueprint(ui_bp)
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    return app
+
+
+def init_logging(app):
+    """
+    Logs errors to error.log outside debug and testing modes.
+    """
+    if app.debug or app.testing:
+        return
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter(
+            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
@@ -2,234 +2,785 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from models import Venue, Artist, Show, db
-from datetime import date
+from models import Venue, Artist, Show, TableVersion, db
+from cache import cache
+from replicas import read_only, replicas
+from records import (
+    VenueSummary, VenueDetails, VenueShow,
+    ArtistSummary, ArtistSearchResult, ArtistDetails, ArtistShow,
+    FacetCount, ShowListing
+)
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+import json
+from sqlalchemy import (
+    BigInteger, String, cast, literal, literal_column, or_, true, tuple_)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql.functions import func
 
+# Text search configuration used by the search_vector triggers.
+SEARCH_CONFIG = 'simple'
+SEARCH_PAGE_SIZE = 20
+PAGE_SIZE = 50
+PAST_SHOWS_PAGE_SIZE = 12
+# Listing pages of this many rows or more are read in batches of this many
+# rows through a server-side cursor.
+STREAM_BATCH_SIZE = 500
+
 #----------------------------------------------------------------------------#
-# Venues' Services.
+# Shared Queries.
 #----------------------------------------------------------------------------#
 
-def get_mini_venue(id, name):
+
+def project(model, record):
+    """
+    Args: model: Model the record's columns are read from.
+          record: Record type.
+
+    Returns: List of the model's columns making up the record.
+    """
+    return [getattr(model, name) for name in record.columns]
+
+
+def get_table_versions(tables, primary=False):
+    """
+    Gets the change counters of the given tables, a cheap validator of
+    everything rendered from them.
+
+    Args: tables: Names of the tables.
+          primary: Read them from the primary, for pages read from it: a
+                   lagging replica's older versions would validate a page
+                   that already changed.
+
+    Returns: Dictionary mapping each table name to its (version, updated_at).
+    """
+    query = db.session.query(
+        TableVersion.table_name,
+        TableVersion.version,
+        TableVersion.updated_at
+    ).filter(TableVersion.table_name.in_(tables))
+    if primary:
+        rows = query.all()
+    else:
+        with read_only():
+            rows = query.all()
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+def refresh_upcoming_counts():
+    """
+    Recomputes the maintained num_upcoming_shows counters of venues and
+    artists. The shows trigger keeps them exact on writes, this rolls them
+    forward as shows move into the past and is meant to run daily.
+
+    Returns: Number of venues and artists whose counter changed.
+    """
+    changed = 0
+    for model, fk_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        count = db.session.query(func.count(Show.id)).filter(
+            fk_column == model.id,
+            Show.start_time > date.today()
+        ).scalar_subquery()
+        changed += model.query.filter(
+            model.num_upcoming_shows != count
+        ).update(
+            {model.num_upcoming_shows: count}, synchronize_session=False)
+    db.session.commit()
+    return changed
+
+
+def encode_cursor(direction, values):
+    """
+    Encodes a keyset position into an opaque, URL safe cursor.
+
+    Args: direction: 'next' or 'prev'.
+          values: Sort key values of the row to continue from.
+
+    Returns: Cursor string.
+    """
+    values = [{'dt': v.isoformat()} if isinstance(v, datetime) else v
+              for v in values]
+    raw = json.dumps([direction] + values, separators=(',', ':'))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by encode_cursor.
+
+    Args: cursor: Cursor string, may be None.
+
+    Returns: Tuple of direction and sort key values, or (None, None) when the
+             cursor is missing or malformed so callers fall back to page one.
+    """
+    if not cursor:
+        return None, None
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = json.loads(raw)
+        values = [datetime.fromisoformat(v['dt']) if isinstance(v, dict)
+                  else v for v in values]
+    except (ValueError, TypeError, KeyError):
+        return None, None
+    if direction not in ('next', 'prev'):
+        return None, None
+    return direction, values
+
+
+def cursor_matches(values, keys):
+    """
+    Args: values: Sort key values decoded from a cursor.
+          keys: Sort key columns of the listing.
+
+    Returns: Whether there is a value of each key's Python type, so a
+             forged cursor cannot fail the query once the page is streaming.
+    """
+    if len(values) != len(keys):
+        return False
+    for value, key in zip(values, keys):
+        python_type = key.type.python_type
+        # bool is an int, but not a valid ID.
+        if isinstance(value, bool) or not isinstance(value, python_type):
+            return False
+    return True
+
+
+@replicas.reads
+def keyset_rows(query, keys, cursor, per_page, page,
+                batch_size=STREAM_BATCH_SIZE):
+    """
+    Streams one page of a query using keyset (seek) pagination.
+
+    Rows are located with a row-value comparison on the sort keys instead of
+    an OFFSET, so every page touches at most per_page + 1 index entries.
+    Pages of batch_size rows or more are read through a server-side cursor,
+    so memory stays flat whatever the page size, smaller ones in a single
+    round trip. Previous pages are read backwards and buffered to be
+    reversed.
+
+    Args: query: Query selecting the page's columns.
+          keys: Unique sort key columns, e.g. (Show.start_time, Show.id).
+          cursor: Cursor received from a previous page, may be None.
+          per_page: Maximum number of rows per page.
+          page: Dictionary receiving the next and previous page's cursors,
+                as 'next' and 'prev', once the rows are exhausted.
+          batch_size: Number of rows fetched per round trip.
+
+    Returns: Iterator of rows, with the key values appended as the trailing
+             columns.
+    """
+    direction, values = decode_cursor(cursor)
+    if values is not None and not cursor_matches(values, keys):
+        direction, values = None, None
+    query = query.add_columns(*keys)
+    if direction == 'prev':
+        query = query.filter(tuple_(*keys) < tuple_(*values)).order_by(
+            *[k.desc() for k in keys])
+    else:
+        if direction == 'next':
+            query = query.filter(tuple_(*keys) > tuple_(*values))
+        query = query.order_by(*keys)
+    query = query.limit(per_page + 1)
+    if per_page >= batch_size:
+        query = query.execution_options(
+            stream_results=True).yield_per(batch_size)
+
+    def key_of(row):
+        return list(row[-len(keys):])
+
+    first = last = None
+    if direction == 'prev':
+        rows = query.all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        if rows:
+            first, last = rows[0], rows[-1]
+        yield from rows
+        has_next, has_prev = True, has_more
+    else:
+        count = 0
+        # Read to the end, the extra row tells whether there is a next page
+        # and the server-side cursor is closed once exhausted.
+        for row in query:
+            count += 1
+            if count > per_page:
+                continue
+            if first is None:
+                first = row
+            last = row
+            yield row
+        has_next, has_prev = count > per_page, direction == 'next'
+
+    page['next'] = encode_cursor('next', key_of(last)) \
+        if last is not None and has_next else None
+    page['prev'] = encode_cursor('prev', key_of(first)) \
+        if first is not None and has_prev else None
+
+
+def stream_page(query, keys, cursor, per_page, record):
+    """
+    Streams one page of a query as records, see keyset_rows.
+
+    Returns: Dictionary of the page: 'data' iterates over the records and
+             'next' and 'prev' hold the adjacent pages' cursors once 'data'
+             is exhausted.
+    """
+    page = {'next': None, 'prev': None}
+    page['data'] = (record(*row) for row in keyset_rows(
+        query, keys, cursor, per_page, page))
+    return page
+
+
+def collect_page(page):
+    """
+    Reads a streamed page to the end.
+
+    Args: page: Dictionary returned by stream_page or a streaming service.
+
+    Returns: Dictionary of the page, its 'data' being a list.
+    """
+    data = list(page['data'])
+    return {'data': data, 'next': page['next'], 'prev': page['prev']}
+
+
+def upcoming_cutoff():
+    """
+    Returns: Start of tomorrow, shows starting from then on are upcoming on
+             the detail pages.
+    """
+    return datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+
+
+def get_related_shows(fk_column, model, record, id, past_page, per_page):
+    """
+    Gets the upcoming shows and one page of past shows of a venue or artist.
+
+    The split between past and upcoming happens in SQL on
+    (fk_column, start_time), and both counts come from a single aggregate,
+    so the cost is bounded by the upcoming shows and the page size no matter
+    how many past shows there are.
+
+    Args: fk_column: Show column referencing the selected entity.
+          model: Model of the other side of the show (Artist or Venue).
+          record: Record type of the shows (ArtistShow/VenueShow).
+          id: ID of the selected entity.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
+
+    Returns: past_shows, upcoming_shows, past_shows_count and
+             upcoming_shows_count, the shows being records.
+    """
+    cutoff = upcoming_cutoff()
+    upcoming_count, past_count = db.session.query(
+        func.count().filter(Show.start_time >= cutoff),
+        func.count().filter(Show.start_time < cutoff)
+    ).filter(fk_column == id).one()
+
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.image_link,
+        Show.start_time
+    ).select_from(Show).join(model).filter(fk_column == id)
+
+    upcoming_shows = []
+    if upcoming_count:
+        upcoming_shows = query.filter(
+            Show.start_time >= cutoff
+        ).order_by(Show.start_time, Show.id).all()
+    past_shows = []
+    if past_count:
+        past_shows = query.filter(
+            Show.start_time < cutoff
+        ).order_by(
+            Show.start_time.desc(), Show.id.desc()
+        ).limit(per_page).offset((max(past_page, 1) - 1) * per_page).all()
+
+    return (record.from_rows(past_shows), record.from_rows(upcoming_shows),
+            past_count, upcoming_count)
+
+
+def get_details(model, record, get_shows, id, past_page, per_page):
     """
-    Args: id: Venue ID, name: Venue name
+    Gets the columns of a venue or artist and its shows as a record.
+
+    Only the record's columns are selected, no instance is loaded into the
+    session.
+
+    Args: model: Venue or Artist.
+          record: Record type of the details (VenueDetails/ArtistDetails).
+          get_shows: Function returning the entity's shows, as
+                     get_related_shows does.
+          id: ID of the selected entity.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
 
-    Returns: Dictionary containing the id, name and number of upcoming shows.
+    Returns: The record.
     """
+    row = db.session.query(*project(model, record)).filter(model.id == id).one()
+    past_shows, upcoming_shows, past_count, upcoming_count = \
+        get_shows(id, past_page, per_page)
+    return record(
+        *row,
+        past_shows=past_shows,
+        upcoming_shows=upcoming_shows,
+        past_shows_count=past_count,
+        upcoming_shows_count=upcoming_count,
+        past_shows_page=max(past_page, 1),
+        past_shows_pages=-(-past_count // per_page))
+
+
+def search(model, record, search_term, page, per_page):
+    """
+    Runs a ranked search over venues or artists in a single statement.
+
+    Matches the full-text search vector (name, area and genres) as well as
+    partial, case-insensitive matches on the name and on "City, ST", all of
+    which are served by the GIN indexes declared on the models. The total
+    count is computed in the same statement.
+
+    Args: model: Venue or Artist.
+          record: Record type of the results, its columns followed by the
+                  total count are selected.
+          search_term: User's input.
+          page: 1-based page of results to return.
+          per_page: Maximum number of results per page.
+
+    Returns: Dictionary containing results' count, page, pages and data.
+    """
+    page = max(page, 1)
+    pattern = f'%{search_term}%'
+    query = func.plainto_tsquery(SEARCH_CONFIG, search_term)
+    area = model.city.op('||')(literal_column("', '")).op('||')(model.state)
+    rank = func.ts_rank(model.search_vector, query) + \
+        func.similarity(model.name, search_term)
+    rows = db.session.query(
+        *project(model, record),
+        func.count().over()
+    ).filter(or_(
+        model.search_vector.op('@@')(query),
+        model.name.ilike(pattern),
+        area.ilike(pattern)
+    )).order_by(
+        rank.desc(), model.name, model.id
+    ).limit(per_page).offset((page - 1) * per_page).all()
+
+    count = rows[0][-1] if rows else 0
     return {
-        'id': id,
-        'name': name,
-        'num_upcoming_shows': db.session
-        .query(Show)
-        .filter(Show.venue_id == id)
-        .filter(Show.start_time > date.today())
-        .count()
+        'count': count,
+        'page': page,
+        'pages': -(-count // per_page),
+        'data': record.from_rows(rows)
     }
 
 
-def get_all_venues():
+def facet_filters(model, seeking_column, genres=(), state=None, seeking=None):
+    """
+    Builds the conditions of the facet filters of a listing.
+
+    Args: model: Venue or Artist.
+          seeking_column: The model's seeking flag.
+          genres: Names of the genres the rows must all have, matched by
+                  the GIN index on genres.
+          state: State of the rows, None for any.
+          seeking: Value of the seeking flag, None for any.
+
+    Returns: List of filter clauses.
+    """
+    clauses = []
+    if genres:
+        clauses.append(model.genres.op('@>')(
+            literal(list(genres), ARRAY(String))))
+    if state is not None:
+        clauses.append(model.state == state)
+    if seeking is not None:
+        clauses.append(seeking_column == seeking)
+    return clauses
+
+
+def get_facets(model, seeking_column, genres=(), state=None, seeking=None):
+    """
+    Gets the facet counts of the venues or artists matching the filters,
+    cached per filters and version of the table, so the workers count them
+    once per change whether the HTML or JSON listing asks for them.
+
+    Args: model: Venue or Artist.
+          seeking_column: The model's seeking flag.
+          genres, state, seeking: Filters, see facet_filters.
+
+    Returns: Dictionary of facet counts, see count_facets.
     """
-    Gets all venues from the database ordered by city and state.
+    table = model.__tablename__
+    version = get_table_versions((table,)).get(table, (0,))[0]
+    key = ('get_facets', table, tuple(genres), state, seeking, version)
+    return cache.get_or_set(key, ('facets', table), lambda: count_facets(
+        model, seeking_column, genres, state, seeking))
 
-    Returns: List of dictionaries containing all venues for each city 
-             containing id, name and number of upcoming shows.
+
+def count_facets(model, seeking_column, genres=(), state=None, seeking=None):
+    """
+    Counts the venues or artists matching the filters per genre, per state
+    and per seeking flag in a single statement, grouping the rows by each
+    in turn (GROUPING SETS).
+
+    The rows are grouped by their whole genres array rather than joined to
+    their unnested genres: the table is read once and only hashed, and the
+    few distinct arrays are then unnested and their counts summed per
+    genre.
+
+    Args: model: Venue or Artist.
+          seeking_column: The model's seeking flag.
+          genres, state, seeking: Filters, see facet_filters.
+
+    Returns: Dictionary of the 'genres', 'states' and 'seeking' lists of
+             FacetCount records, most frequent first.
+    """
+    groups = db.session.query(
+        model.genres, model.state, seeking_column.label('seeking'),
+        func.count().label('rows')
+    ).filter(
+        *facet_filters(model, seeking_column, genres, state, seeking)
+    ).group_by(func.grouping_sets(
+        tuple_(model.genres), tuple_(model.state), tuple_(seeking_column)
+    )).subquery()
+    genre = func.unnest(groups.c.genres).table_valued(
+        'name').render_derived().lateral('genre')
+    rows = db.session.query(
+        func.grouping(genre.c.name, groups.c.state),
+        genre.c.name,
+        groups.c.state,
+        groups.c.seeking,
+        # A sum of counts is numeric.
+        cast(func.sum(groups.c.rows), BigInteger)
+    ).select_from(groups).outerjoin(genre, true()).group_by(
+        func.grouping_sets(tuple_(genre.c.name), tuple_(groups.c.state),
+                           tuple_(groups.c.seeking)))
+
+    facets = {'genres': [], 'states': [], 'seeking': []}
+    for grouping, name, area, flag, count in rows:
+        # grouping has a bit set per column the row is not grouped by. The
+        # groups of the other sets, and the arrays without genres, fall in
+        # a None value, which is no facet.
+        if grouping == 1:
+            if name is not None:
+                facets['genres'].append(FacetCount(name, count))
+        elif grouping == 2:
+            if area is not None:
+                facets['states'].append(FacetCount(area, count))
+        elif flag is not None:
+            facets['seeking'].append(FacetCount(flag, count))
+    for counts in facets.values():
+        counts.sort(key=lambda facet: (-facet.count, str(facet.value)))
+    return facets
+
+#----------------------------------------------------------------------------#
+# Venues' Services.
+#----------------------------------------------------------------------------#
+
+
+def stream_all_venues(cursor=None, per_page=PAGE_SIZE, genres=(), state=None,
+                      seeking=None):
+    """
+    Streams one page of venues from the database grouped by city and state.
+
+    A single statement fetches the page of venues together with their
+    maintained upcoming shows counter, ordered by area, and the rows are
+    folded into areas as they are read.
+
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of venues per page.
+          genres, state, seeking: Filters, see facet_filters, seeking
+                                  being the seeking talent flag.
+
+    Returns: Dictionary of the page, see stream_page, whose data iterates
+             over the areas, each one holding the list of its venues' id,
+             name and number of upcoming shows.
+    """
+    query = db.session.query(*project(Venue, VenueSummary)).filter(
+        *facet_filters(Venue, Venue.seeking_talent, genres, state, seeking))
+    page = {'next': None, 'prev': None}
+    rows = keyset_rows(
+        query, (Venue.city, Venue.state, Venue.id), cursor, per_page, page)
+    page['data'] = (
+        {'city': city, 'state': state,
+         'venues': VenueSummary.from_rows(venues)}
+        for (city, state), venues in groupby(rows, key=itemgetter(3, 4)))
+    return page
+
+
+@replicas.reads
+def get_all_venues(cursor=None, per_page=PAGE_SIZE, genres=(), state=None,
+                   seeking=None):
     """
-    areas = db.session.query(Venue.city, Venue.state).distinct()
-    venues_list = []
-    for area in areas:
-        area = dict(area)
-        query_result = db.session.query(Venue.id, Venue.name).filter_by(
-            city=area['city'], state=area['state']).all()
-        venues = [get_mini_venue(v['id'], v['name']) for v in query_result]
-        area['venues'] = venues
-        venues_list.append(area)
-    return venues_list
+    Gets one page of venues from the database grouped by city and state.
 
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of venues per page.
+          genres, state, seeking: Filters, see stream_all_venues.
 
-def get_search_venues(search_term):
+    Returns: Dictionary containing the list of areas for the page, each one
+             holding its venues' id, name and number of upcoming shows,
+             and the next and previous page cursors.
     """
-    Searches for venues that contains the given search term.
+    return collect_page(stream_all_venues(
+        cursor, per_page, genres, state, seeking))
+
+
+@replicas.reads
+def get_venue_facets(genres=(), state=None, seeking=None):
+    """
+    Counts the venues matching the filters per genre, state and seeking
+    talent flag, for the filters of the venues listing.
+
+    Args: genres, state, seeking: Filters, see stream_all_venues.
+
+    Returns: Dictionary of facet counts, see get_facets.
+    """
+    return get_facets(Venue, Venue.seeking_talent, genres, state, seeking)
+
+
+@replicas.reads
+def get_search_venues(search_term, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Searches for venues by name, city and state or genres.
 
     Args: search_term: User's input looking for a specific venue.
+          page: 1-based page of results to return.
+          per_page: Maximum number of results per page.
 
-    Returns: Dictionary containing results' count and a list of found venues.
+    Returns: Dictionary containing results' count, the current page and
+             a list of found venues ranked by relevance.
     """
-    query_result = db.session.query(Venue.id, Venue.name).filter(
-        Venue.name.ilike(f'%{search_term}%')).all()
-    response = [get_mini_venue(v['id'], v['name']) for v in query_result]
-    return {'count': len(response), 'data': response}
+    return search(Venue, VenueSummary, search_term, page, per_page)
 
 
-def get_shows_with_artist(id):
+def get_shows_with_artist(id, past_page=1, per_page=PAST_SHOWS_PAGE_SIZE):
     """
-    Gets a list of upcoming and past shows with artist details.
+    Gets upcoming shows and a page of past shows with artist details.
 
     Args: id: ID of the selected venue.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
 
     Returns: past_shows and upcoming shows these are lists each one contains 
              artist details and show date which are related to the venue in 
-             the past or in the future.
+             the past or in the future, followed by the total number of
+             past and upcoming shows.
     """
-    keys = ['artist_id', 'artist_name', 'artist_image_link', 'start_time']
-    past_shows = []
-    upcoming_shows = []
-    shows = db.session.query(
-        Artist.id,
-        Artist.name,
-        Artist.image_link,
-        Show.start_time
-    ).join(Artist
-           ).filter(Show.venue_id == id).all()
+    return get_related_shows(
+        Show.venue_id, Artist, ArtistShow, id, past_page, per_page)
 
-    for show in shows:
-        show = dict(zip(keys, show))
-        date_temp = show['start_time'].date()
-        show['start_time'] = str(show['start_time'])
-        if(date_temp > date.today()):
-            upcoming_shows.append(show)
-        else:
-            past_shows.append(show)
-    return past_shows, upcoming_shows
 
-
-def get_full_venue(id):
+# Read from the primary: a page cached from a lagging replica would be
+# served until it expires, long after the change feed evicted it.
+@cache.cached('venue')
+def get_full_venue(id, past_page=1, per_page=PAST_SHOWS_PAGE_SIZE):
     """
-    Gets all details of the selected venue including past and upcoming shows.
+    Gets all details of the selected venue including upcoming shows and
+    a page of past shows.
 
     Args: id: ID of the selected venue.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
+
+    Returns: VenueDetails record of all details related to that venue.
+    """
+    return get_details(Venue, VenueDetails, get_shows_with_artist,
+                       id, past_page, per_page)
+
 
-    Returns: Dictionary of all details related to that venue.
+def get_venue_artist_ids(id):
     """
-    venue = Venue.query.get(id).to_dict()
-    past_shows, upcoming_shows = get_shows_with_artist(id)
-    venue['past_shows'] = past_shows
-    venue['upcoming_shows'] = upcoming_shows
-    venue['past_shows_count'] = len(past_shows)
-    venue['upcoming_shows_count'] = len(upcoming_shows)
-    return venue
+    Args: id: ID of the venue.
+
+    Returns: List of IDs of the artists with shows at the venue.
+    """
+    return [artist_id for (artist_id,) in db.session.query(
+        Show.artist_id).filter(Show.venue_id == id).distinct()]
+
+
+def invalidate_venue(id, artists=None):
+    """
+    Drops the cached details of a venue and of the artists listing it in
+    their shows. Runs after the change is committed, so no concurrent
+    request caches the previous details again.
+
+    Args: id: ID of the changed venue.
+          artists: IDs of the related artists, read from the shows when
+                   None. Those of a deleted venue must be read before its
+                   shows are deleted, see get_venue_artist_ids.
+
+    Returns: List of IDs of the related artists.
+    """
+    cache.invalidate('venue', id)
+    if artists is None:
+        artists = get_venue_artist_ids(id)
+    for artist_id in artists:
+        cache.invalidate('artist', artist_id)
+    return artists
 
 #----------------------------------------------------------------------------#
 # Artists' Services.
 #----------------------------------------------------------------------------#
 
 
-def get_mini_artist(id, name):
+def stream_all_artists(cursor=None, per_page=PAGE_SIZE, genres=(),
+                       state=None, seeking=None):
     """
-    Args: id: Artist ID, name: Artist name
+    Streams one page of artists from the database ordered by name.
+
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of artists per page.
+          genres, state, seeking: Filters, see facet_filters, seeking
+                                  being the seeking venue flag.
 
-    Returns: Dictionary containing the id, name and number of upcoming shows.
+    Returns: Dictionary of the page, see stream_page, whose data iterates
+             over the artists' id and name.
     """
-    return {
-        'id': id,
-        'name': name,
-        'num_upcoming_shows': db.session
-        .query(Show)
-        .filter(Show.artist_id == id)
-        .filter(Show.start_time > date.today())
-        .count()
-    }
+    return stream_page(
+        db.session.query(*project(Artist, ArtistSummary)).filter(
+            *facet_filters(Artist, Artist.seeking_venue,
+                           genres, state, seeking)),
+        (Artist.name, Artist.id), cursor, per_page, ArtistSummary)
+
+
+@replicas.reads
+def get_all_artists(cursor=None, per_page=PAGE_SIZE, genres=(), state=None,
+                    seeking=None):
+    """
+    Gets one page of artists from the database ordered by name.
+
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of artists per page.
+          genres, state, seeking: Filters, see stream_all_artists.
+
+    Returns: Dictionary containing the list of artists' id and name for the
+             page and the next and previous page cursors.
+    """
+    return collect_page(stream_all_artists(
+        cursor, per_page, genres, state, seeking))
 
 
-def get_all_artists():
+@replicas.reads
+def get_artist_facets(genres=(), state=None, seeking=None):
     """
-    Gets all artists from the database.
+    Counts the artists matching the filters per genre, state and seeking
+    venue flag, for the filters of the artists listing.
 
-    Returns: list of dictionaries containing id and name of each artist.
+    Args: genres, state, seeking: Filters, see stream_all_artists.
+
+    Returns: Dictionary of facet counts, see get_facets.
     """
-    return db.session.query(Artist.id, Artist.name).order_by('id').all()
+    return get_facets(Artist, Artist.seeking_venue, genres, state, seeking)
 
 
-def get_search_artists(search_term):
+@replicas.reads
+def get_search_artists(search_term, page=1, per_page=SEARCH_PAGE_SIZE):
     """
-    Searches for artists that contains the given search term.
+    Searches for artists by name, city and state or genres.
 
     Args: search_term: User's input looking for a specific artist.
+          page: 1-based page of results to return.
+          per_page: Maximum number of results per page.
 
-    Returns: Dictionary containing results' count and a list of found artists.
+    Returns: Dictionary containing results' count, the current page and
+             a list of found artists ranked by relevance.
     """
-    query_result = db.session.query(Artist.id, Artist.name).filter(
-        Artist.name.ilike(f'%{search_term}%')).all()
-    response = [get_mini_artist(v['id'], v['name']) for v in query_result]
-    return {'count': len(response), 'data': response}
+    return search(Artist, ArtistSearchResult, search_term, page, per_page)
 
 
-def get_shows_with_venues(id):
+def get_shows_with_venues(id, past_page=1, per_page=PAST_SHOWS_PAGE_SIZE):
     """
-    Gets a list of upcoming and past shows with venue details.
+    Gets upcoming shows and a page of past shows with venue details.
 
     Args: id: ID of the selected artist.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
 
     Returns: past_shows and upcoming shows these are lists each one contains 
              venue details and show date which are related to the artist in 
-             the past or in the future.
+             the past or in the future, followed by the total number of
+             past and upcoming shows.
     """
-    keys = ['venue_id', 'venue_name', 'venue_image_link', 'start_time']
-    past_shows = []
-    upcoming_shows = []
-    shows = db.session.query(
-        Venue.id,
-        Venue.name,
-        Venue.image_link,
-        Show.start_time
-    ).join(Venue
-           ).filter(Show.artist_id == id).all()
+    return get_related_shows(
+        Show.artist_id, Venue, VenueShow, id, past_page, per_page)
 
-    for show in shows:
-        show = dict(zip(keys, show))
-        date_temp = show['start_time'].date()
-        show['start_time'] = str(show['start_time'])
-        if(date_temp > date.today()):
-            upcoming_shows.append(show)
-        else:
-            past_shows.append(show)
 
-    return past_shows, upcoming_shows
+# Read from the primary, see get_full_venue.
+@cache.cached('artist')
+def get_full_artist(id, past_page=1, per_page=PAST_SHOWS_PAGE_SIZE):
+    """
+    Gets all details of the selected artist including upcoming shows and
+    a page of past shows.
 
+    Args: id: ID of the selected artist.
+          past_page: 1-based page of past shows, most recent first.
+          per_page: Maximum number of past shows per page.
 
-def get_full_artist(id):
+    Returns: ArtistDetails record of all details related to that artist.
     """
-    Gets all details of the selected artist including past and upcoming shows.
+    return get_details(Artist, ArtistDetails, get_shows_with_venues,
+                       id, past_page, per_page)
 
-    Args: id: ID of the selected artist.
 
-    Returns: Dictionary of all details related to that artist.
+def invalidate_artist(id):
     """
-    artist = Artist.query.get(id)
-    artist = artist.to_dict()
-    past_shows, upcoming_shows = get_shows_with_venues(id)
-    artist['past_shows'] = past_shows
-    artist['upcoming_shows'] = upcoming_shows
-    artist['past_shows_count'] = len(past_shows)
-    artist['upcoming_shows_count'] = len(upcoming_shows)
-    return artist
+    Drops the cached details of an artist and of the venues listing it in
+    their shows.
+
+    Args: id: ID of the changed artist.
+    """
+    cache.invalidate('artist', id)
+    venues = db.session.query(Show.venue_id).filter(
+        Show.artist_id == id).distinct()
+    for (venue_id,) in venues:
+        cache.invalidate('venue', venue_id)
 
 #----------------------------------------------------------------------------#
 # Shows' Services.
 #----------------------------------------------------------------------------#
 
 
-def get_all_shows():
+def stream_all_shows(cursor=None, per_page=PAGE_SIZE):
     """
-    Gets all shows from the database.
+    Streams one page of shows from the database ordered by start time.
+
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of shows per page.
 
-    Returns: List of dictionaries containing venue name, artist name and artist's image.
+    Returns: Dictionary of the page, see stream_page, whose data iterates
+             over the shows with venue name, artist name and artist's image.
     """
-    shows = db.session.query(
-        Show,
+    query = db.session.query(
+        Show.venue_id,
         Venue.name,
+        Show.artist_id,
         Artist.name,
         Artist.image_link
+    ).select_from(
+        Show
     ).join(
         Venue
     ).join(
         Artist
-    ).all()
-    result = []
-    for show in shows:
-        show_dict = show['Show'].to_dict()
-        show_dict['start_time'] = str(show_dict['start_time'])
-        show_dict['venue_name'] = show[1]
-        show_dict['artist_name'] = show[2]
-        show_dict['artist_image_link'] = show['image_link']
-        result.append(show_dict)
-    return result
+    )
+    # start_time and id are the sort keys appended by keyset_rows.
+    return stream_page(
+        query, (Show.start_time, Show.id), cursor, per_page, ShowListing)
+
+
+@replicas.reads
+def get_all_shows(cursor=None, per_page=PAGE_SIZE):
+    """
+    Gets one page of shows from the database ordered by start time.
+
+    Args: cursor: Cursor of the page to fetch, None for the first page.
+          per_page: Maximum number of shows per page.
+
+    Returns: Dictionary containing the list of shows for the page with venue
+             name, artist name and artist's image, and the next and previous
+             page cursors.
+    """
+    return collect_page(stream_all_shows(cursor, per_page))
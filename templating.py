@@ -0,0 +1,242 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import tempfile
+from flask import current_app, g, get_flashed_messages, stream_with_context
+from jinja2 import FileSystemBytecodeCache, nodes, pass_environment
+from jinja2.ext import Extension
+from cache import LRUCache
+from services import get_table_versions
+
+# Template output pieces gathered into each chunk of a streamed page.
+STREAM_BUFFER_SIZE = 64
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+
+def stream_template(template_name, **context):
+    """
+    Renders a template while it is sent, like render_template but returning
+    chunks of the page as they are rendered, so the client receives the
+    layout and first rows before the last rows are read. The request context
+    is kept until the page is sent.
+
+    Args: template_name: Name of the template.
+          context: Variables of the template.
+
+    Returns: Iterator of text chunks, for a Response.
+    """
+    app = current_app._get_current_object()
+    # The session is saved before the page is rendered: flashed messages
+    # are popped now, the layout's get_flashed_messages() returns them
+    # from the request.
+    get_flashed_messages()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        stream = metrics.time_render(stream)
+    return stream_with_context(stream)
+
+#----------------------------------------------------------------------------#
+# Bytecode Cache.
+#----------------------------------------------------------------------------#
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """
+    On-disk cache of the compiled templates, shared by the workers and kept
+    across restarts so a new worker loads templates instead of compiling
+    them. Files are replaced atomically, a worker never reads one another
+    worker is writing, and an unwritable directory only costs compiling.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(path, self._get_cache_filename(bucket))
+        except OSError:
+            if os.path.exists(path):
+                os.remove(path)
+
+#----------------------------------------------------------------------------#
+# Fragment Cache.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja tag caching the markup of a block under a key, e.g.:
+
+        {% cache 'show', show.id, version %} ... {% endcache %}
+
+    The key must change whenever the block's output would, typically the
+    entity's ID and the version of the tables it is rendered from, see
+    table_version.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.filters['_fragment_get'] = fragment_get
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        # Compiled to a lookup and a branch, so a hit costs a single filter
+        # call (calling a function from a template costs several, and a
+        # call block builds a macro):
+        #     {% set fragment = key|_fragment_get %}
+        #     {% if fragment is none %}
+        #       {% call _render(key) %}body{% endcall %}
+        #     {% else %}{{ fragment }}{% endif %}
+        name = '_fragment_{}'.format(lineno)
+        key = nodes.Tuple(key, 'load')
+        return [
+            nodes.Assign(
+                nodes.Name(name, 'store'),
+                nodes.Filter(key, '_fragment_get', [], [], None, None)),
+            nodes.If(
+                nodes.Test(nodes.Name(name, 'load'), 'none', [], [], None,
+                           None),
+                [nodes.CallBlock(self.call_method('_render', [key]),
+                                 [], [], body)],
+                [],
+                [nodes.Output([nodes.Name(name, 'load')])],
+            ).set_lineno(lineno),
+        ]
+
+    def _render(self, key, caller):
+        return self.environment.app.extensions['fragments'].set(
+            key, caller())
+
+
+@pass_environment
+def fragment_get(environment, key):
+    return environment.app.extensions['fragments'].get(key)
+
+
+class FragmentCache:
+    """
+    Template caches: the bytecode cache of compiled templates and the
+    per-process cache of rendered fragments used by the cache tag.
+
+    Configured from the app config:
+        JINJA_BYTECODE_CACHE_DIR: Directory of the compiled templates,
+                                  empty to compile in every process.
+        FRAGMENT_CACHE_MAX_SIZE: Maximum number of fragments, 0 to render
+                                 every fragment.
+        CACHE_TTL: Seconds a fragment stays cached.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Must run before the Jinja environment is first used, it is created
+        from the app's jinja_options.
+        """
+        options = dict(app.jinja_options)
+        options['extensions'] = list(options.get('extensions', ())) + \
+            [FragmentCacheExtension]
+        directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+        if directory:
+            options['bytecode_cache'] = SharedBytecodeCache(directory)
+        app.jinja_options = options
+        max_size = app.config.get('FRAGMENT_CACHE_MAX_SIZE', 10000)
+        self.backend = LRUCache(
+            max_size=max_size, ttl=app.config.get('CACHE_TTL', 300)) \
+            if max_size > 0 else None
+        app.add_template_global(table_version)
+        app.extensions['fragments'] = self
+
+    def get(self, key):
+        """
+        Args: key: Key of the fragment.
+
+        Returns: The fragment's markup, None when it is not cached.
+        """
+        if self.backend is None:
+            return None
+        found, value = self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return None
+
+    def set(self, key, markup):
+        """
+        Caches a rendered fragment.
+
+        Returns: The markup.
+        """
+        if self.backend is not None:
+            self.backend.set(key, markup, key[0])
+        return markup
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """
+        Returns: Dictionary of the hit and miss counters and the size.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.backend) if self.backend is not None else None,
+        }
+
+    def samples(self):
+        """
+        Returns: The counters as (name, type, help, value) metric samples.
+        """
+        stats = self.stats()
+        return [
+            ('fyyur_fragment_cache_hits_total', 'counter',
+             'Template fragments served from cache.', stats['hits']),
+            ('fyyur_fragment_cache_misses_total', 'counter',
+             'Template fragments rendered.', stats['misses']),
+            ('fyyur_fragment_cache_entries', 'gauge',
+             'Cached template fragments.', stats['size']),
+        ]
+
+
+def table_version(*tables):
+    """
+    Template global returning the change counters of the given tables, to
+    key the fragments rendered from them. Reuses the counters read by the
+    conditional decorator for the current request.
+
+    Args: tables: Names of the tables.
+
+    Returns: Tuple of the tables' versions.
+    """
+    versions = g.get('table_versions')
+    if versions is None or not versions.keys() >= set(tables):
+        versions = get_table_versions(tables)
+    return tuple(versions.get(t, (0,))[0] for t in tables)
+
+
+fragments = FragmentCache()
@@ -0,0 +1,118 @@
+"""
+Number of SQL statements of the listing pages, which must not grow with
+the catalogue.
+
+Runs against the database named by TEST_DB_NAME (fyyur_test by default),
+which must be migrated and is filled with the generated catalogue of
+benchmarks/datagen.py: use a dedicated database, its catalogue is
+replaced. The tests are skipped when it cannot be reached.
+
+Usage:
+    TEST_DB_NAME=fyyur_test python -m pytest -q tests
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Last, benchmarks/compression.py must not shadow compression.py.
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+
+# Read by config.py when the app is imported.
+os.environ['DB_NAME'] = os.getenv('TEST_DB_NAME', 'fyyur_test')
+os.environ['TESTING'] = 'true'
+os.environ['CHANGEFEED_ENABLED'] = 'false'
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['FRAGMENT_CACHE_MAX_SIZE'] = '0'
+
+# Catalogue scales of 20 and 200 venues, below and above one page.
+SCALES = (0.02, 0.2)
+
+
+@pytest.fixture(scope='module')
+def app():
+    from sqlalchemy.exc import OperationalError
+    from server import create_app
+    from models import db
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.session.execute('SELECT 1 FROM venues LIMIT 1')
+    except OperationalError as e:
+        pytest.skip('Test database unavailable: {}'.format(e.orig))
+    return app
+
+
+@contextmanager
+def count_statements(app):
+    """
+    Counts the statements sent to the app's database within.
+
+    Returns: List the statements are appended to.
+    """
+    from sqlalchemy import event
+    from models import db
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def statements_per_scale(app, run):
+    """
+    Loads a catalogue of each scale and counts the statements of run.
+
+    Args: app: The app.
+          run: Function running the page, called once to warm up (e.g. the
+               first request reads the table versions) and once counted.
+
+    Returns: List of the numbers of statements, one per scale.
+    """
+    from datagen import load
+
+    counts = []
+    for scale in SCALES:
+        load(app, scale)
+        run()
+        with count_statements(app) as statements:
+            run()
+        counts.append(len(statements))
+    return counts
+
+
+def test_get_all_venues_statements(app):
+    from services import get_all_venues
+
+    def run():
+        with app.app_context():
+            page = get_all_venues()
+            assert page['data']
+
+    counts = statements_per_scale(app, run)
+    assert counts[0] == counts[-1], counts
+
+
+@pytest.mark.parametrize('path', ['/venues', '/venues?format=json'])
+def test_venues_page_statements(app, path):
+    client = app.test_client()
+
+    def run():
+        with client.get(path) as response:
+            assert response.status_code == 200
+            response.get_data()
+
+    counts = statements_per_scale(app, run)
+    assert counts[0] == counts[-1], counts
@@ -0,0 +1,117 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+from sqlalchemy import text
+from models import Venue, Artist, db
+from filters import DATETIME_FORMATS, compiled_pattern
+from services import get_full_venue, get_full_artist
+
+#----------------------------------------------------------------------------#
+# Warm-up.
+#----------------------------------------------------------------------------#
+
+
+def warm_templates(app):
+    """
+    Compiles every template and the date formats of the datetime filter.
+    Done before forking, the workers share the result.
+
+    Returns: Number of templates compiled.
+    """
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    for format in DATETIME_FORMATS:
+        compiled_pattern(format, 'en')
+    return len(names)
+
+
+def warm_pool(app):
+    """
+    Opens the pool's connections up front so the first requests do not pay
+    for connecting. Must run in each worker, connections do not survive
+    forking.
+
+    Returns: Number of connections opened.
+    """
+    engine = db.get_engine(app)
+    size = getattr(engine.pool, 'size', lambda: 0)()
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connection.execute(text('SELECT 1'))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def warm_cache(app, count):
+    """
+    Caches the detail pages of the venues and artists with the most
+    upcoming shows, the most requested ones.
+
+    Args: app: The app.
+          count: Number of venues and of artists to cache.
+
+    Returns: Number of pages cached.
+    """
+    if count <= 0:
+        return 0
+    per_page = app.config['PAST_SHOWS_PAGE_SIZE']
+    cached = 0
+    for model, get_full in ((Venue, get_full_venue),
+                            (Artist, get_full_artist)):
+        ids = db.session.query(model.id).order_by(
+            model.num_upcoming_shows.desc(), model.id).limit(count)
+        # Same arguments as the detail routes, so their requests hit.
+        for id, in ids.all():
+            get_full(id, past_page=1, per_page=per_page)
+            cached += 1
+    return cached
+
+
+def start_changefeed(app, timeout=5):
+    """
+    Starts the worker's change feed listener, which must listen before the
+    cache is filled: the changes committed meanwhile would never evict the
+    pages cached.
+
+    Returns: Whether it listens, None when the change feed is disabled.
+    """
+    changefeed = app.extensions.get('changefeed')
+    if changefeed is None:
+        return None
+    changefeed.start()
+    return changefeed.wait(timeout)
+
+
+def warm_up(app):
+    """
+    Warms a worker before it accepts requests: change feed listener,
+    connection pool and cache. Failures are logged, an unreachable database
+    must not stop the worker from starting (and failing its readiness check
+    instead).
+
+    Returns: Dictionary of what was warmed and how long it took.
+    """
+    started = time.perf_counter()
+    report = {}
+    with app.app_context():
+        try:
+            report['listening'] = start_changefeed(app)
+            report['connections'] = warm_pool(app)
+            # Pages cached without a listener would never be evicted.
+            if report['listening'] is not False:
+                report['cached_pages'] = warm_cache(
+                    app, app.config.get('WARMUP_CACHED_PAGES', 0))
+        except Exception:
+            app.logger.exception('Warm-up failed')
+        finally:
+            db.session.remove()
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report